@@ -133,7 +133,7 @@ deploy_local() {
   ./venv/bin/pip install -r requirements.txt
 
   pkill -f "uvicorn server:app --host 127.0.0.1 --port $port" >/dev/null 2>&1 || true
-  nohup ./venv/bin/uvicorn server:app --host 127.0.0.1 --port "$port" > local-app.log 2>&1 < /dev/null &
+  nohup ./venv/bin/uvicorn server:app --host 127.0.0.1 --port "$port" --loop uvloop --http httptools > local-app.log 2>&1 < /dev/null &
   echo $! > .local-uvicorn.pid
   sleep 1
 
@@ -181,7 +181,7 @@ if systemctl cat $T_SERVICE >/dev/null 2>&1 && systemctl stop $T_SERVICE 2>/dev/
 else
   pkill -f "uvicorn server:app --host 127.0.0.1 --port $T_PORT" >/dev/null 2>&1 || true
   sleep 1
-  nohup ./venv/bin/uvicorn server:app --host 127.0.0.1 --port "$T_PORT" > app.log 2>&1 < /dev/null &
+  nohup ./venv/bin/uvicorn server:app --host 127.0.0.1 --port "$T_PORT" --loop uvloop --http httptools > app.log 2>&1 < /dev/null &
   echo \$! > .uvicorn.pid
   sleep 1
   PID=\$(cat .uvicorn.pid)
@@ -2,25 +2,31 @@ from __future__ import annotations
 
 import uuid
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 import asyncpg
 
 
 class HireError(Exception):
-    pass
+    """Base hire failure; status_code/code map onto the API error envelope."""
+
+    status_code = 400
+    code = "hire_error"
 
 
 class HireNotFound(HireError):
-    pass
+    status_code = 404
+    code = "not_found"
 
 
 class HireForbidden(HireError):
-    pass
+    status_code = 403
+    code = "forbidden"
 
 
 class HireInvalidState(HireError):
-    pass
+    status_code = 409
+    code = "invalid_state"
 
 
 class HireInsufficientBalance(HireError):
@@ -398,6 +404,42 @@ class HireStore:
                     uid, endpoint, amount_sats,
                 )
 
+    async def collect(
+        self,
+        account_id: str,
+        amount_sats: int,
+        endpoint: str,
+        pay: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        """
+        Debit the account and run the payment callable in one transaction.
+
+        The account row stays locked until `pay` resolves: if the payment
+        raises, the whole transaction rolls back and the debit never
+        happened, so there is no separate best-effort refund to lose.
+        Raises HireNotFound / HireInsufficientBalance like debit_account.
+        """
+        uid = uuid.UUID(account_id)
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(
+                    "select id, balance_sats from accounts where id = $1 for update", uid,
+                )
+                if row is None:
+                    raise HireNotFound("account not found")
+                balance = int(row["balance_sats"])
+                if balance < amount_sats:
+                    raise HireInsufficientBalance(balance_sats=balance, required_sats=amount_sats)
+                await conn.execute(
+                    "update accounts set balance_sats = balance_sats - $1, updated_at = now() where id = $2",
+                    amount_sats, uid,
+                )
+                await conn.execute(
+                    "insert into usage_log (account_id, endpoint, amount_sats) values ($1, $2, $3)",
+                    uid, endpoint, amount_sats,
+                )
+                return await pay()
+
     async def credit_account(self, account_id: str, amount_sats: int) -> None:
         """Credit an account (e.g. refund on failed LN payment)."""
         uid = uuid.UUID(account_id)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from lib.phoenix import PhoenixClient, PhoenixError
+
+
+class InvoicePool:
+    """Background pool of pre-created Lightning invoices per amount tier.
+
+    Creating an invoice is an out-of-process phoenixd RPC sitting on the 402
+    response path. Pre-minting a few invoices for each configured price tier
+    turns the common case into a deque pop; a background task refills drained
+    tiers. Pooled invoices carry a generic "prepaid" description. Entries that
+    sit unused until they are close to their expiry are discarded rather than
+    handed out.
+    """
+
+    # Seconds of remaining invoice lifetime below which a pooled entry is
+    # considered too stale to hand to a client.
+    STALE_MARGIN_SECONDS = 120
+
+    def __init__(
+        self,
+        phoenix_client: PhoenixClient,
+        expiry_seconds: int,
+        target_per_tier: int = 4,
+        refill_interval_seconds: float = 2.0,
+    ) -> None:
+        self._phoenix = phoenix_client
+        self._expiry_seconds = expiry_seconds
+        self._usable_seconds = max(expiry_seconds - self.STALE_MARGIN_SECONDS, 60)
+        self._target = target_per_tier
+        self._refill_interval = refill_interval_seconds
+        self._tiers: Dict[int, Deque[Tuple[float, Dict[str, Any]]]] = {}
+        self._task: Optional[asyncio.Task[None]] = None
+
+    def register_tier(self, amount_sats: int) -> None:
+        if amount_sats > 0 and amount_sats not in self._tiers:
+            self._tiers[amount_sats] = deque()
+
+    def start(self) -> None:
+        if self._task is None and self._tiers:
+            self._task = asyncio.create_task(self._refill_worker())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def take(self, amount_sats: int) -> Optional[Tuple[Dict[str, Any], int]]:
+        """Pop a pre-warmed invoice for the tier, or None if none is usable.
+
+        Returns the invoice together with its remaining lifetime in seconds,
+        so callers advertise how long the invoice is actually payable rather
+        than the full expiry of a freshly minted one.
+        """
+        tier = self._tiers.get(amount_sats)
+        if not tier:
+            return None
+        now = time.monotonic()
+        stale_before = now - self._usable_seconds
+        while tier:
+            created_at, invoice = tier.popleft()
+            if created_at >= stale_before:
+                return invoice, int(self._expiry_seconds - (now - created_at))
+        return None
+
+    async def _refill_worker(self) -> None:
+        while True:
+            for amount_sats, tier in self._tiers.items():
+                self._prune(tier)
+                while len(tier) < self._target:
+                    try:
+                        invoice = await self._phoenix.create_invoice(
+                            amount_sats=amount_sats,
+                            description="prepaid",
+                        )
+                    except PhoenixError:
+                        # phoenixd unreachable; retry on the next sweep.
+                        break
+                    tier.append((time.monotonic(), invoice))
+            await asyncio.sleep(self._refill_interval)
+
+    def _prune(self, tier: Deque[Tuple[float, Dict[str, Any]]]) -> None:
+        stale_before = time.monotonic() - self._usable_seconds
+        while tier and tier[0][0] < stale_before:
+            tier.popleft()
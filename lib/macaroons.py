@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import base64
+import hmac
+from typing import List, NamedTuple
+
+# Fixed HMAC key macaroons use to derive the signing key from a root key
+# (same constant as pymacaroons / libmacaroons).
+_KEY_GENERATOR = b"macaroons-key-generator"
+
+
+def derive_key(root_key: bytes) -> bytes:
+    """
+    Derive the macaroon signing key from a root key.
+
+    pymacaroons recomputes this HMAC on every mint and every verify even
+    though the root key is fixed for the process; callers should run it once
+    at startup and reuse the result.
+    """
+    return hmac.digest(_KEY_GENERATOR, root_key, "sha256")
+
+
+def chain_signature(
+    derived_key: bytes, identifier: bytes, caveats: List[bytes]
+) -> bytes:
+    """Standard macaroon HMAC chain: sign identifier, fold in each caveat."""
+    # hmac.digest is a one-shot C path (no HMAC object, no update/digest
+    # round trip), which matters because every link re-keys the HMAC.
+    signature = hmac.digest(derived_key, identifier, "sha256")
+    for caveat in caveats:
+        signature = hmac.digest(signature, caveat, "sha256")
+    return signature
+
+
+def _packet(key: bytes, data: bytes) -> bytes:
+    # v1 binary packet: 4 hex chars of total length, key, space, data, newline.
+    total = 4 + len(key) + 1 + len(data) + 1
+    return ("%04x" % total).encode("ascii") + key + b" " + data + b"\n"
+
+
+def mint(
+    location: str, identifier: str, caveats: List[str], derived_key: bytes
+) -> str:
+    """
+    Build a serialized v1 macaroon with first-party caveats.
+
+    Output is byte-identical to pymacaroons' Macaroon(...).serialize() for the
+    same inputs, so existing clients and verifiers are unaffected.
+    """
+    identifier_b = identifier.encode("utf-8")
+    caveats_b = [caveat.encode("utf-8") for caveat in caveats]
+    signature = chain_signature(derived_key, identifier_b, caveats_b)
+
+    parts = [
+        _packet(b"location", location.encode("utf-8")),
+        _packet(b"identifier", identifier_b),
+    ]
+    parts.extend(_packet(b"cid", caveat) for caveat in caveats_b)
+    parts.append(_packet(b"signature", signature))
+    return base64.urlsafe_b64encode(b"".join(parts)).decode("ascii").rstrip("=")
+
+
+class ParsedMacaroon(NamedTuple):
+    location: str
+    identifier: str
+    caveats: List[str]
+    signature: bytes
+
+
+def parse(serialized: str) -> ParsedMacaroon:
+    """
+    Parse a serialized v1 macaroon with first-party caveats only.
+
+    Raises ValueError on malformed input, including third-party caveat
+    packets (vid/cl), which this service never mints.
+    """
+    raw = base64.urlsafe_b64decode(serialized + "=" * (-len(serialized) % 4))
+    location = ""
+    identifier: str | None = None
+    caveats: List[str] = []
+    signature: bytes | None = None
+
+    pos = 0
+    end = len(raw)
+    while pos < end:
+        try:
+            total = int(raw[pos : pos + 4], 16)
+        except ValueError as exc:
+            raise ValueError("Invalid packet length") from exc
+        packet = raw[pos + 4 : pos + total]
+        pos += total
+        if total < 6 or not packet.endswith(b"\n"):
+            raise ValueError("Malformed packet")
+        key, sep, value = packet[:-1].partition(b" ")
+        if not sep:
+            raise ValueError("Malformed packet")
+        if key == b"location":
+            location = value.decode("utf-8")
+        elif key == b"identifier":
+            identifier = value.decode("utf-8")
+        elif key == b"cid":
+            caveats.append(value.decode("utf-8"))
+        elif key == b"signature":
+            signature = value
+        else:
+            raise ValueError(f"Unsupported packet type: {key!r}")
+
+    if identifier is None or signature is None:
+        raise ValueError("Missing identifier or signature packet")
+    return ParsedMacaroon(location, identifier, caveats, signature)
+
+
+def verify(parsed: ParsedMacaroon, derived_key: bytes) -> bool:
+    """Check the HMAC chain of a parsed macaroon against a derived key."""
+    expected = chain_signature(
+        derived_key,
+        parsed.identifier.encode("utf-8"),
+        [caveat.encode("utf-8") for caveat in parsed.caveats],
+    )
+    return hmac.compare_digest(expected, parsed.signature)
@@ -1,19 +1,35 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import httpx
 
+# phoenixd RPCs are quick once connected; keep the per-call budget short.
+_TIMEOUT = httpx.Timeout(20.0)
+
 
 class PhoenixError(Exception):
     pass
 
 
 class PhoenixClient:
-    def __init__(self, base_url: str, password: str) -> None:
+    def __init__(
+        self,
+        base_url: str,
+        password: str,
+        client: Optional[httpx.AsyncClient] = None,
+    ) -> None:
         self.base_url = base_url.rstrip("/")
         self.password = password
         self._auth = ("", password)
+        self._client = client
+
+    def attach_client(self, client: httpx.AsyncClient) -> None:
+        """Use a shared keepalive client instead of one connection per RPC.
+
+        The caller owns the client's lifecycle; this class never closes it.
+        """
+        self._client = client
 
     async def create_invoice(self, amount_sats: int, description: str) -> Dict[str, Any]:
         payload = {
@@ -36,8 +52,17 @@ class PhoenixClient:
     ) -> Dict[str, Any]:
         url = f"{self.base_url}{path}"
         try:
-            async with httpx.AsyncClient(timeout=20) as client:
-                response = await client.request(method, url, auth=self._auth, data=data)
+            if self._client is not None:
+                response = await self._client.request(
+                    method, url, auth=self._auth, data=data, timeout=_TIMEOUT
+                )
+            else:
+                # No shared client attached (tests, one-off scripts): fall
+                # back to a throwaway connection per call.
+                async with httpx.AsyncClient(timeout=_TIMEOUT) as client:
+                    response = await client.request(
+                        method, url, auth=self._auth, data=data
+                    )
         except httpx.HTTPError as exc:
             raise PhoenixError(f"phoenix request failed: {exc}") from exc
 
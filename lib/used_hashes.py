@@ -1,71 +1,100 @@
 from __future__ import annotations
 
-import threading
 import time
-from typing import Dict
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+
+_NUM_SHARDS = 256
 
 
 class UsedHashSet:
-    def __init__(
-        self,
-        ttl_seconds: int = 3600,
-        cleanup_interval_seconds: int = 300,
-    ) -> None:
+    """
+    TTL set of redeemed payment hashes, sharded by the first hash byte.
+
+    Hashes are hex SHA-256 digests, so the first two hex chars distribute
+    uniformly across 256 shards and the first 16 decoded bytes are unique
+    enough to stand in for the full digest at half the memory. Each shard is
+    an insertion-ordered OrderedDict; entries are only ever appended with the
+    current time, so the oldest entries sit at the front and expiry is a
+    popitem loop amortized over inserts — no background sweeper needed.
+
+    Not thread-safe by design: the server runs handlers on a single event
+    loop and no method awaits, so calls can never interleave mid-operation.
+    mark_used stays an atomic check-and-insert under that model. Running
+    multiple uvicorn workers would need shared state (each worker only sees
+    its own redemptions), not finer locking, so locks here would buy nothing.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600) -> None:
         self.ttl_seconds = ttl_seconds
-        self.cleanup_interval_seconds = cleanup_interval_seconds
 
-        self._lock = threading.Lock()
-        self._used_hashes: Dict[str, float] = {}
-        self._last_cleanup = 0.0
+        self._shards: List[OrderedDict[bytes, float]] = [
+            OrderedDict() for _ in range(_NUM_SHARDS)
+        ]
+
+    @staticmethod
+    def _key_and_shard(payment_hash: str) -> Tuple[bytes, int]:
+        try:
+            raw = bytes.fromhex(payment_hash)
+        except ValueError:
+            # Non-hex input (e.g. a malformed macaroon caveat) — any stable
+            # key works; correctness only needs consistency.
+            raw = payment_hash.encode("utf-8", "replace")
+        if not raw:
+            return b"", 0
+        return raw[:16], raw[0]
 
     def is_used(self, payment_hash: str) -> bool:
         payment_hash = payment_hash.lower()
         if not payment_hash:
             return False
 
+        key, idx = self._key_and_shard(payment_hash)
         now = time.time()
-        with self._lock:
-            self._maybe_cleanup(now)
-            return payment_hash in self._used_hashes
+        shard = self._shards[idx]
+        marked_at = shard.get(key)
+        if marked_at is None:
+            return False
+        if marked_at < now - self.ttl_seconds:
+            del shard[key]
+            return False
+        return True
 
     def mark_used(self, payment_hash: str) -> bool:
         payment_hash = payment_hash.lower()
         if not payment_hash:
             return False
 
+        key, idx = self._key_and_shard(payment_hash)
         now = time.time()
-        with self._lock:
-            self._maybe_cleanup(now)
-            if payment_hash in self._used_hashes:
-                return False
-            self._used_hashes[payment_hash] = now
-            return True
+        expire_before = now - self.ttl_seconds
+        shard = self._shards[idx]
+        while shard:
+            oldest_key, marked_at = next(iter(shard.items()))
+            if marked_at >= expire_before:
+                break
+            del shard[oldest_key]
+        if key in shard:
+            return False
+        shard[key] = now
+        return True
 
     def cleanup(self) -> None:
         now = time.time()
-        with self._lock:
-            self._cleanup(now)
+        expire_before = now - self.ttl_seconds
+        for shard in self._shards:
+            while shard:
+                oldest_key, marked_at = next(iter(shard.items()))
+                if marked_at >= expire_before:
+                    break
+                del shard[oldest_key]
 
     def stats(self) -> Dict[str, int]:
-        now = time.time()
-        with self._lock:
-            self._maybe_cleanup(now)
-            count = len(self._used_hashes)
-            return {
-                "pending": 0,
-                "used": count,
-                "known_used_hashes": count,
-            }
-
-    def _maybe_cleanup(self, now: float) -> None:
-        if now - self._last_cleanup >= self.cleanup_interval_seconds:
-            self._cleanup(now)
-
-    def _cleanup(self, now: float) -> None:
-        used_expire_before = now - self.ttl_seconds
-        self._used_hashes = {
-            payment_hash: ts
-            for payment_hash, ts in self._used_hashes.items()
-            if ts >= used_expire_before
+        self.cleanup()
+        count = sum(len(shard) for shard in self._shards)
+        return {
+            "pending": 0,
+            "used": count,
+            "known_used_hashes": count,
         }
-        self._last_cleanup = now
@@ -2,22 +2,40 @@ from __future__ import annotations
 
 import asyncio
 import hashlib
-import json
+import hmac
+import io
 import os
+import re
 import secrets
+import stat
+import sys
 import time
 import uuid as _uuid
-from decimal import Decimal, ROUND_HALF_UP
-from datetime import datetime, timezone
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, AsyncIterator, Dict, Optional, Tuple
+from typing import (Annotated, Any, AsyncIterator, Callable, ClassVar, Dict,
+                    Optional, Tuple, Type)
 
 import httpx
+import orjson
 import yaml
 from dotenv import load_dotenv
-from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
-from pymacaroons import Macaroon, Verifier
+from fastapi import Depends, FastAPI, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import (BaseModel, ConfigDict, PositiveInt, StringConstraints,
+                      ValidationError, field_validator)
+from starlette.background import BackgroundTask
+from starlette.middleware.gzip import GZipMiddleware
+
+from fastapi.responses import (
+    FileResponse,
+    ORJSONResponse,
+    Response,
+    StreamingResponse,
+)
 
 from lib.hire_store import (
     HireError,
@@ -27,6 +45,8 @@ from lib.hire_store import (
     HireNotFound,
     HireStore,
 )
+from lib import macaroons
+from lib.invoice_pool import InvoicePool
 from lib.phoenix import PhoenixClient, PhoenixError
 from lib.topup_store import (
     SupabaseTopupStore,
@@ -38,9 +58,19 @@ from lib.topup_store import (
 )
 from lib.used_hashes import UsedHashSet
 
+try:
+    # uvicorn's "auto" loop already prefers uvloop, but installing it here
+    # guarantees the libuv event loop even when the server is launched
+    # without the CLI (tests, `python -c`, embedded runners).
+    import uvloop
+
+    uvloop.install()
+except ImportError:
+    pass
+
 
 # ── Daily rate limiter (promo loss protection) ────────────────────
-# Tiered daily call caps per endpoint path. Resets at midnight UTC.
+# Tiered call caps per endpoint path over a rolling 24-hour window.
 # In-memory only — restarts reset counters (fine for promo).
 DAILY_RATE_LIMITS: Dict[str, int] = {
     # Expensive: video gen, pro reasoning models
@@ -53,23 +83,24 @@ DAILY_RATE_LIMITS: Dict[str, int] = {
     "_default": 1000,
 }
 
-_daily_counters: Dict[str, int] = {}
-_daily_counters_date: str = ""
+# Request timestamps per path slot (slots built once after config load).
+# A sliding window instead of a midnight-reset bucket: the cap can't be
+# burst twice around a day boundary, and expiry is an amortized-O(1)
+# popleft per request. Single event loop + no await inside the check, so
+# the deque ops need no lock.
 
 
 def _check_daily_limit(normalized_path: str) -> Optional[str]:
-    """Return error message if daily limit exceeded, else None."""
-    global _daily_counters, _daily_counters_date
-    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    if today != _daily_counters_date:
-        _daily_counters = {}
-        _daily_counters_date = today
-
-    limit = DAILY_RATE_LIMITS.get(normalized_path, DAILY_RATE_LIMITS["_default"])
-    count = _daily_counters.get(normalized_path, 0)
-    if count >= limit:
-        return f"Daily limit of {limit} calls reached for {normalized_path}. Resets at midnight UTC."
-    _daily_counters[normalized_path] = count + 1
+    """Return error message if the rolling 24h limit is exceeded, else None."""
+    slot = _DAILY_PATH_SLOTS[normalized_path]
+    window = _daily_windows[slot]
+    now = time.time()
+    cutoff = now - 86400.0
+    while window and window[0] < cutoff:
+        window.popleft()
+    if len(window) >= _daily_limits[slot]:
+        return _daily_limit_messages[slot]
+    window.append(now)
     return None
 
 
@@ -82,151 +113,437 @@ SATRING_VERIFY_PATH = BASE_DIR / ".well-known" / "satring-verify"
 load_dotenv(BASE_DIR / ".env.secrets")
 load_dotenv(BASE_DIR / ".env")
 
+try:
+    # LibYAML's C loader parses the config several times faster than the
+    # pure-Python SafeLoader; wheels without the C extension fall back.
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # pragma: no cover - depends on how PyYAML was built
+    from yaml import SafeLoader as _YamlLoader
+
 with CONFIG_PATH.open("r", encoding="utf-8") as f:
-    CONFIG = yaml.safe_load(f)
+    CONFIG = yaml.load(f, Loader=_YamlLoader)
 
+# Static for the process lifetime; hoisted so 402 paths skip the dict
+# lookup and int() cast per response.
+_INVOICE_EXPIRY: int = int(CONFIG.get("invoice_expiry", 600))
 
-def _build_error(status_code: int, code: str, message: str) -> JSONResponse:
-    return JSONResponse(
+# Pre-encoded X-Price-Sats values for the canonical endpoint prices; odd
+# topup amounts fall back to str().encode().
+_SATS_BYTES: Dict[int, bytes] = {
+    n: str(n).encode("ascii") for n in (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+}
+
+# Slot arrays backing _check_daily_limit. Every path the limiter can see is a
+# configured endpoint path, so slots are assigned once here.
+_DAILY_PATH_SLOTS: Dict[str, int] = {}
+for _api_cfg in CONFIG.get("apis", {}).values():
+    for _ep_cfg in _api_cfg.get("endpoints", []):
+        _ep_path = sys.intern(_ep_cfg.get("path", "").rstrip("/"))
+        if _ep_path and _ep_path not in _DAILY_PATH_SLOTS:
+            _DAILY_PATH_SLOTS[_ep_path] = len(_DAILY_PATH_SLOTS)
+_daily_limits = array(
+    "q",
+    (
+        DAILY_RATE_LIMITS.get(_slot_path, DAILY_RATE_LIMITS["_default"])
+        for _slot_path in _DAILY_PATH_SLOTS
+    ),
+)
+_daily_windows = [deque() for _ in range(len(_DAILY_PATH_SLOTS))]
+_daily_limit_messages = [
+    f"Daily limit of {_daily_limits[_slot]} calls reached for {_slot_path}. "
+    "Limit is per rolling 24 hours."
+    for _slot_path, _slot in _DAILY_PATH_SLOTS.items()
+]
+del _api_cfg, _ep_cfg, _ep_path
+
+
+# Every (status, code) pair the handlers emit. The JSON envelope for these is
+# constant except for the message, so the prefix bytes are precomputed once and
+# _build_error only has to encode the message itself.
+_ERROR_CODES: Tuple[Tuple[int, str], ...] = (
+    (400, "invalid_request"),
+    (400, "invalid_amount"),
+    (400, "invalid_payment"),
+    (400, "payment_already_used"),
+    (400, "missing_token"),
+    (400, "missing_field"),
+    (400, "invalid_field"),
+    (400, "missing_required_field"),
+    (400, "invalid_field_type"),
+    (400, "invalid_field_value"),
+    (400, "model_not_supported"),
+    (400, "hire_error"),
+    (401, "invalid_token"),
+    (401, "invalid_l402"),
+    (401, "account_required"),
+    (402, "insufficient_balance"),
+    (402, "insufficient_payment"),
+    (403, "forbidden"),
+    (404, "not_found"),
+    (404, "api_not_found"),
+    (409, "invalid_state"),
+    (429, "daily_limit_reached"),
+    (500, "server_error"),
+    (502, "upstream_error"),
+    (502, "payment_failed"),
+    (503, "topup_unavailable"),
+    (503, "phoenix_unavailable"),
+    (503, "hire_unavailable"),
+    (503, "frontend_unavailable"),
+)
+
+_ERROR_PREFIXES: Dict[Tuple[int, str], bytes] = {
+    (status, code): b'{"error":{"code":"' + code.encode("ascii") + b'","message":'
+    for status, code in _ERROR_CODES
+}
+_ERROR_SUFFIX = b"}}"
+
+
+# Encoded error bodies, keyed by the full (status, code, message) triple.
+# Most error messages are fixed strings repeated across requests; bodies with
+# interpolated per-request detail churn through, so the cache is reset rather
+# than grown when it fills.
+_ERROR_BODY_CACHE: Dict[Tuple[int, str, str], bytes] = {}
+_ERROR_BODY_CACHE_MAX = 256
+
+
+def _build_error(status_code: int, code: str, message: str) -> Response:
+    prefix = _ERROR_PREFIXES.get((status_code, code))
+    if prefix is None:
+        return ORJSONResponse(
+            status_code=status_code,
+            content={"error": {"code": code, "message": message}},
+        )
+    key = (status_code, code, message)
+    body = _ERROR_BODY_CACHE.get(key)
+    if body is None:
+        body = prefix + orjson.dumps(message) + _ERROR_SUFFIX
+        if len(_ERROR_BODY_CACHE) >= _ERROR_BODY_CACHE_MAX:
+            _ERROR_BODY_CACHE.clear()
+        _ERROR_BODY_CACHE[key] = body
+    return Response(
+        content=body,
         status_code=status_code,
-        content={"error": {"code": code, "message": message}},
+        media_type="application/json",
     )
 
 
+# Fully static error responses reused across requests (nothing mutates them).
+_TOPUP_UNAVAILABLE = _build_error(
+    503, "topup_unavailable", "Topup service is not configured"
+)
+
+
+# 413 bodies keyed by cap. The caps come from config (one per endpoint at
+# most), so this stays a handful of entries serialized once each.
+_REQUEST_TOO_LARGE_BODIES: Dict[int, bytes] = {}
+
+
+def _request_too_large(max_bytes: int) -> Response:
+    # Carries an extra max_bytes field, so it can't go through _build_error.
+    body = _REQUEST_TOO_LARGE_BODIES.get(max_bytes)
+    if body is None:
+        body = orjson.dumps({
+            "error": {
+                "code": "request_too_large",
+                "message": f"Max request size: {max_bytes} bytes",
+                "max_bytes": max_bytes,
+            }
+        })
+        _REQUEST_TOO_LARGE_BODIES[max_bytes] = body
+    return Response(
+        content=body,
+        status_code=413,
+        media_type="application/json",
+    )
+
+
+class ApiError(Exception):
+    """
+    Error carrying the standard envelope fields.
+
+    Raised from helpers and dependencies where returning a Response is
+    awkward; the app-level handler renders it through _build_error so the
+    wire format matches errors returned directly.
+    """
+
+    __slots__ = ("status_code", "code", "message")
+
+    def __init__(self, status_code: int, code: str, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+
+
 def _canonical_hash(payment_hash: str) -> str:
-    return payment_hash.strip().lower()
+    # Sources (phoenixd payloads, parsed caveats, hexdigests) are already
+    # whitespace-free, so canonicalizing is just case folding.
+    return payment_hash.lower()
+
 
+_HEX_RE = re.compile(r"[0-9a-fA-F]{64}", re.ASCII)
 
+
+@lru_cache(maxsize=4096)
 def _hash_from_preimage(preimage: str) -> str:
+    # Memoized: the paid retry (and any client resends) present the same
+    # preimage string, so the SHA-256 runs once per distinct payment.
     preimage = preimage.strip()
     if not preimage:
         raise ValueError("Missing preimage")
+    if len(preimage) != 64:
+        raise ValueError("Preimage must decode to 32 bytes")
+    # Matching up front keeps bytes.fromhex from ever raising, so malformed
+    # input takes one precompiled-regex branch instead of exception unwind.
+    if _HEX_RE.fullmatch(preimage) is None:
+        raise ValueError("Preimage must be hex-encoded")
 
-    try:
-        raw = bytes.fromhex(preimage)
-    except ValueError as exc:
-        raise ValueError("Preimage must be hex-encoded") from exc
+    return hashlib.sha256(bytes.fromhex(preimage)).hexdigest()
 
-    if len(raw) != 32:
-        raise ValueError("Preimage must decode to 32 bytes")
 
-    return hashlib.sha256(raw).hexdigest()
+def _payment_hashes_match(derived_hex: str, expected_hex: str) -> bool:
+    """
+    Compare a preimage-derived payment hash against the macaroon's hash.
+
+    A blatantly wrong preimage diverges in the first few hex chars, so check
+    a short prefix first and only run the full constant-time comparison when
+    the prefix matches (preserving timing-attack resistance for near-misses).
+    """
+    if derived_hex[:8] != expected_hex[:8]:
+        return False
+    return hmac.compare_digest(derived_hex.encode(), expected_hex.encode())
+
+
+# Flat route table built once from config: (api, METHOD, path) -> (api_config,
+# endpoint_config, normalized_path). Lookups that used to scan every endpoint
+# per request become at most two dict gets (raw path, then the /v1 alias).
+_API_CONFIGS: Dict[str, Dict[str, Any]] = CONFIG.get("apis", {})
+_ROUTE_TABLE: Dict[
+    Tuple[str, str, str], Tuple[Dict[str, Any], Dict[str, Any], str]
+] = {}
+for _route_api_name, _route_api_cfg in _API_CONFIGS.items():
+    for _route_ep in _route_api_cfg.get("endpoints", []):
+        # Interned so the normalized_path handed to every downstream dict and
+        # set lookup is the one canonical object and key comparison is a
+        # pointer check.
+        _route_path = sys.intern(_route_ep.get("path", "").rstrip("/"))
+        if _route_path:
+            _route_method = _route_ep.get("method", "POST").upper()
+            _route_hit = (_route_api_cfg, _route_ep, _route_path)
+            _ROUTE_TABLE[(_route_api_name, _route_method, _route_path)] = _route_hit
+            # Clients may omit the /v1 prefix the configured paths carry;
+            # registering the alias key here keeps that form a single get.
+            if _route_path.startswith("/v1/"):
+                _ROUTE_TABLE.setdefault(
+                    (_route_api_name, _route_method, _route_path[3:]), _route_hit
+                )
+del _route_api_name, _route_api_cfg, _route_ep, _route_path, _route_method, _route_hit
+
+# Denormalize pricing at import: flat prices become ints under "_flat_price"
+# and per-model entries are normalized to dicts with integer price_sats under
+# "_models_norm", so the request path never re-coerces raw YAML values. The
+# request-size cap is resolved to a plain int under "_max_bytes", and the
+# proxy's per-endpoint constants (full upstream URL, uppercased method,
+# timeout) land under "_upstream_url"/"_method"/"_upstream_timeout" for the
+# same reason.
+_DEFAULT_MAX_REQUEST_BYTES = int(CONFIG.get("max_request_bytes", 32768))
+# Endpoints whose bodies may carry "stream": true and so can switch the
+# proxy into SSE relay mode.
+_STREAMABLE_PATHS = frozenset({"/v1/chat/completions", "/v1/responses"})
+_SLOW_UPSTREAM_PATHS = frozenset({
+    "/v1/video/generations",
+    "/v1/responses",
+    "/v1/images/generations",
+    "/v1/images/edits",
+})
+for _price_api_cfg in _API_CONFIGS.values():
+    _api_base = str(_price_api_cfg.get("upstream_base", "")).rstrip("/")
+    for _price_ep in _price_api_cfg.get("endpoints", []):
+        _ep_cap = _price_ep.get("max_request_bytes")
+        _price_ep["_max_bytes"] = (
+            int(_ep_cap) if _ep_cap is not None else _DEFAULT_MAX_REQUEST_BYTES
+        )
+        _ep_path = _price_ep.get("path", "").rstrip("/")
+        if _api_base.startswith("http") and _ep_path:
+            _price_ep["_upstream_url"] = _api_base + _ep_path
+        _price_ep["_method"] = _price_ep.get("method", "POST").upper()
+        _price_ep["_upstream_timeout"] = (
+            600 if _ep_path in _SLOW_UPSTREAM_PATHS else 180
+        )
+        if _price_ep.get("price_type") == "flat":
+            _price_ep["_flat_price"] = int(_price_ep.get("price_sats", 0))
+        _price_models = _price_ep.get("models")
+        if _price_models:
+            _normalized = {}
+            for _model_name, _model_entry in _price_models.items():
+                if isinstance(_model_entry, dict):
+                    _model_entry = dict(_model_entry)
+                    _model_entry["price_sats"] = int(_model_entry.get("price_sats", 0))
+                    if _model_entry.get("max_output_tokens") is not None:
+                        _model_entry["max_output_tokens"] = int(
+                            _model_entry["max_output_tokens"]
+                        )
+                else:
+                    _model_entry = {"price_sats": int(_model_entry)}
+                _normalized[_model_name] = _model_entry
+            _price_ep["_models_norm"] = _normalized
+del _price_api_cfg, _price_ep, _price_models, _ep_cap, _api_base, _ep_path
+
+
+# Endpoint paths whose bodies must be JSON objects; everything else (audio
+# transcription uploads etc.) passes through as-is.
+_REQUIRES_JSON = frozenset(map(sys.intern, (
+    "/v1/chat/completions",
+    "/v1/responses",
+    "/v1/images/generations",
+    "/v1/audio/speech",
+    "/v1/embeddings",
+    "/v1/moderations",
+    "/v1/video/generations",
+)))
+
+# Top-level path roots that must never fall through to the SPA catchall.
+_RESERVED_ROOTS = frozenset({"api"})
 
 
 def _resolve_api_endpoint(
     api_name: str, endpoint_path: str, method: str
 ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], str]:
-    api_config = CONFIG.get("apis", {}).get(api_name)
     raw_path = "/" + endpoint_path.lstrip("/")
-    candidates = {
-        raw_path.rstrip("/"),
-        f"/v1/{endpoint_path.lstrip('/')}".rstrip("/"),
-    }
-    normalized_method = method.upper()
-    if api_config is None:
-        return None, None, raw_path
+    if not method.isupper():
+        # ASGI servers hand methods over uppercased already; only pay for
+        # the copy when a caller passes a mixed-case method.
+        method = method.upper()
+    key_path = raw_path.rstrip("/")
 
-    for endpoint in api_config.get("endpoints", []):
-        if endpoint.get("method", "POST").upper() != normalized_method:
-            continue
-        configured_path = endpoint.get("path", "").rstrip("/")
-        if configured_path in candidates:
-            return api_config, endpoint, configured_path
+    hit = _ROUTE_TABLE.get((api_name, method, key_path))
+    if hit is not None:
+        return hit
 
-    return api_config, None, raw_path
+    if api_name not in _API_CONFIGS:
+        return None, None, raw_path
+    return _API_CONFIGS[api_name], None, raw_path
 
 
 def _utc_timestamp_iso(timestamp: float) -> Optional[str]:
     if timestamp <= 0:
         return None
-    return (
-        datetime.fromtimestamp(timestamp, tz=timezone.utc)
-        .replace(microsecond=0)
-        .isoformat()
-        .replace("+00:00", "Z")
-    )
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(int(timestamp)))
 
 
-def _frontend_missing_response() -> JSONResponse:
-    return _build_error(
-        503,
-        "frontend_unavailable",
-        "Frontend build not found. Run `cd frontend && npm run build`.",
-    )
+_FRONTEND_MISSING = _build_error(
+    503,
+    "frontend_unavailable",
+    "Frontend build not found. Run `cd frontend && npm run build`.",
+)
+
+
+def _frontend_missing_response() -> Response:
+    return _FRONTEND_MISSING
+
+
+_DIST_ROOT = FRONTEND_DIST_DIR.resolve()
 
 
 def _frontend_index_response() -> Response:
-    if not FRONTEND_INDEX.exists():
+    resolved = _resolve_frontend_file("")
+    if resolved is None:
         return _frontend_missing_response()
-    return FileResponse(FRONTEND_INDEX)
+    path, stat_result = resolved
+    return FileResponse(path, stat_result=stat_result)
+
 
+@lru_cache(maxsize=2048)
+def _resolve_frontend_file(path: str) -> Optional[Tuple[Path, os.stat_result]]:
+    """
+    Resolve a request path to a file under the frontend dist, with its stat.
 
-def _resolve_frontend_file(path: str) -> Optional[Path]:
+    Results (including misses) are cached — the dist is immutable between
+    deploys and every deploy restarts the process, so path resolution and the
+    blocking stat happen once per distinct URL instead of per request.
+    """
     if not path:
-        return FRONTEND_INDEX if FRONTEND_INDEX.exists() else None
+        candidate = FRONTEND_INDEX
+    else:
+        requested_path = Path(path)
+        if requested_path.is_absolute() or ".." in requested_path.parts:
+            return None
+        candidate = (FRONTEND_DIST_DIR / requested_path).resolve()
+        if _DIST_ROOT not in candidate.parents and candidate != _DIST_ROOT:
+            return None
 
-    requested_path = Path(path)
-    if requested_path.is_absolute() or ".." in requested_path.parts:
+    try:
+        stat_result = candidate.stat()
+    except OSError:
         return None
-
-    candidate = (FRONTEND_DIST_DIR / requested_path).resolve()
-    dist_root = FRONTEND_DIST_DIR.resolve()
-    if dist_root not in candidate.parents and candidate != dist_root:
+    if not stat.S_ISREG(stat_result.st_mode):
         return None
-    if candidate.is_file():
-        return candidate
-    return None
+    return candidate, stat_result
 
 
 def _max_request_bytes(endpoint: Dict[str, Any]) -> int:
-    endpoint_cap = endpoint.get("max_request_bytes")
-    if endpoint_cap is not None:
-        return int(endpoint_cap)
-    return int(CONFIG.get("max_request_bytes", 32768))
+    # Precomputed at import; every endpoint resolved via _ROUTE_TABLE
+    # carries "_max_bytes", the get() default is just belt and braces.
+    return endpoint.get("_max_bytes", _DEFAULT_MAX_REQUEST_BYTES)
 
 
 def _resolve_model_config(
     endpoint: Dict[str, Any], model_name: str
 ) -> Optional[Dict[str, Any]]:
-    models = endpoint.get("models", {})
+    models = endpoint.get("_models_norm")
+    if models is None:
+        return None
     model_entry = models.get(model_name)
     if model_entry is None:
         model_entry = models.get("_default")
-    if model_entry is None:
-        return None
-    if isinstance(model_entry, dict):
-        return model_entry
-    return {"price_sats": model_entry}
-
-
-def _price_for_request(endpoint: Dict[str, Any], request_body: Dict[str, Any]) -> int:
-    price_type = endpoint.get("price_type")
-    if price_type == "flat":
-        return int(endpoint.get("price_sats", 0))
-    if price_type == "per_model":
-        requested_model = request_body.get("model")
-        model_name = str(requested_model) if requested_model is not None else "_default"
-        model_config = _resolve_model_config(endpoint, model_name)
+    return model_entry
+
+
+def _resolve_request_model(
+    endpoint: Dict[str, Any], request_body: Dict[str, Any]
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Resolve the requested model name and its config entry exactly once.
+
+    Both the request rules and the pricing step need the same lookup, so the
+    caller resolves it up front and threads the result through instead of
+    each helper re-probing the body and the model table.
+    """
+    requested_model = request_body.get("model")
+    model_name = str(requested_model) if requested_model is not None else "_default"
+    return model_name, _resolve_model_config(endpoint, model_name)
+
+
+def _price_for_request(
+    endpoint: Dict[str, Any],
+    model_name: str,
+    model_config: Optional[Dict[str, Any]],
+) -> int:
+    flat_price = endpoint.get("_flat_price")
+    if flat_price is not None:
+        return flat_price
+    if endpoint.get("price_type") == "per_model":
         if model_config is None:
             raise LookupError(f"model_not_supported:{model_name}")
-        return int(model_config.get("price_sats", 0))
-    raise ValueError(f"unsupported price type: {price_type}")
+        return model_config["price_sats"]
+    raise ValueError(f"unsupported price type: {endpoint.get('price_type')}")
 
 
 def _apply_output_token_cap(
-    endpoint: Dict[str, Any],
     body: Dict[str, Any],
+    model_name: str,
+    model_config: Optional[Dict[str, Any]],
 ) -> Dict[str, Any]:
-    """Enforce max_output_tokens cap from model config on a request body."""
-    requested_model = body.get("model")
-    model_name = str(requested_model) if requested_model is not None else "_default"
-    model_config = _resolve_model_config(endpoint, model_name)
+    """Enforce max_output_tokens cap from model config on a request body.
+
+    Mutates and returns the caller-owned body dict.
+    """
     if model_config is None:
         raise LookupError(f"model_not_supported:{model_name}")
 
-    cap = model_config.get("max_output_tokens")
-    if cap is not None:
-        cap_int = int(cap)
+    # The cap was coerced to int when the model table was denormalized.
+    cap_int = model_config.get("max_output_tokens")
+    if cap_int is not None:
         requested_max = body.get("max_tokens")
         if requested_max is None:
             requested_max = body.get("max_completion_tokens")
@@ -246,30 +563,38 @@ def _apply_output_token_cap(
     return body
 
 
+_PATHS_FORCE_N1 = frozenset(
+    map(sys.intern, ("/v1/images/generations", "/v1/images/edits", "/v1/video/generations"))
+)
+
+
 def _apply_request_rules(
     endpoint_path: str,
-    endpoint: Dict[str, Any],
     request_body: Dict[str, Any],
-) -> Dict[str, Any]:
-    body = dict(request_body)
-
+    model_name: str,
+    model_config: Optional[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    # The caller owns request_body — it is a fresh dict from orjson.loads
+    # that nothing else holds — so rules mutate it in place rather than
+    # paying for a defensive copy. Returns None when nothing changed so the
+    # caller can keep forwarding the client's original bytes instead of
+    # re-serializing.
     if endpoint_path == "/v1/chat/completions":
-        body = _apply_output_token_cap(endpoint, body)
+        body = _apply_output_token_cap(request_body, model_name, model_config)
         # Restore max_tokens key for chat completions API compatibility
         cap_val = body.pop("max_output_tokens", None)
         if cap_val is not None:
             body["max_tokens"] = cap_val
+        return body
 
     if endpoint_path == "/v1/responses":
-        body = _apply_output_token_cap(endpoint, body)
+        return _apply_output_token_cap(request_body, model_name, model_config)
 
-    if endpoint_path in {"/v1/images/generations", "/v1/images/edits"}:
-        body["n"] = 1
+    if endpoint_path in _PATHS_FORCE_N1 and request_body.get("n") != 1:
+        request_body["n"] = 1
+        return request_body
 
-    if endpoint_path == "/v1/video/generations":
-        body["n"] = 1
-
-    return body
+    return None
 
 
 _REQUIRED_FIELDS: Dict[str, list[tuple[str, Any]]] = {
@@ -291,10 +616,60 @@ def _expected_type_label(expected_type: Any) -> str:
     return "valid type"
 
 
+def _make_field_validator(requirements: list[tuple[str, Any]]):
+    """Compile one path's requirements into a closure over prebuilt error
+    responses, so the per-request work is just the isinstance checks."""
+    checks = []
+    for field_name, expected_type in requirements:
+        checks.append(
+            (
+                field_name,
+                expected_type,
+                _build_error(
+                    400,
+                    "missing_required_field",
+                    f"Required field '{field_name}' is missing",
+                ),
+                _build_error(
+                    400,
+                    "invalid_field_type",
+                    f"Field '{field_name}' must be "
+                    f"{_expected_type_label(expected_type)}",
+                ),
+                _build_error(
+                    400,
+                    "invalid_field_value",
+                    f"Field '{field_name}' must not be empty",
+                ),
+            )
+        )
+
+    def validate(request_body: Dict[str, Any]) -> Optional[Response]:
+        for field_name, expected_type, missing, bad_type, empty in checks:
+            value = request_body.get(field_name)
+            if value is None:
+                return missing
+            if not isinstance(value, expected_type):
+                return bad_type
+            if isinstance(value, list) and len(value) == 0:
+                return empty
+            if isinstance(value, str) and not value.strip():
+                return empty
+        return None
+
+    return validate
+
+
+_VALIDATORS = {
+    sys.intern(path): _make_field_validator(requirements)
+    for path, requirements in _REQUIRED_FIELDS.items()
+}
+
+
 def _validate_required_fields(
     normalized_path: str,
     request_body: Dict[str, Any],
-) -> Optional[JSONResponse]:
+) -> Optional[Response]:
     """
     Validate required JSON fields before issuing an invoice.
 
@@ -302,60 +677,32 @@ def _validate_required_fields(
     images/variations) are intentionally not pre-validated here because the
     request body is stored as raw multipart bytes, not parsed into JSON.
     """
-    requirements = _REQUIRED_FIELDS.get(normalized_path)
-    if not requirements:
+    validator = _VALIDATORS.get(normalized_path)
+    if validator is None:
         return None
-
-    for field_name, expected_type in requirements:
-        value = request_body.get(field_name)
-        if value is None:
-            return _build_error(
-                400,
-                "missing_required_field",
-                f"Required field '{field_name}' is missing",
-            )
-
-        if not isinstance(value, expected_type):
-            return _build_error(
-                400,
-                "invalid_field_type",
-                f"Field '{field_name}' must be {_expected_type_label(expected_type)}",
-            )
-
-        if isinstance(value, list) and len(value) == 0:
-            return _build_error(
-                400,
-                "invalid_field_value",
-                f"Field '{field_name}' must not be empty",
-            )
-
-        if isinstance(value, str) and not value.strip():
-            return _build_error(
-                400,
-                "invalid_field_value",
-                f"Field '{field_name}' must not be empty",
-            )
-
-    return None
+    return validator(request_body)
 
 
 def _sats_to_usd_cents(sats: int, btc_usd: Optional[float]) -> Optional[float]:
     if btc_usd is None:
         return None
-    cents = (
-        Decimal(sats)
-        * Decimal(str(btc_usd))
-        / Decimal("100000000")
-        * Decimal("100")
-    )
-    return float(cents.quantize(Decimal("0.1"), rounding=ROUND_HALF_UP))
+    # cents = sats / 1e8 BTC * price * 100, rounded half-up to a tenth of a
+    # cent. The quote is scaled to integer microdollars first so the rounding
+    # happens in exact integer arithmetic rather than on a float near .5.
+    scaled = round(btc_usd * 1_000_000)
+    return (sats * scaled + 50_000_000_000) // 100_000_000_000 / 10.0
 
 
-def _build_catalog(
-    btc_usd: Optional[float],
-    btc_usd_updated_at: Optional[str],
-) -> Dict[str, Any]:
+def _build_catalog_static() -> Tuple[Dict[str, Any], list]:
+    """
+    Walk CONFIG once and materialize the price-independent catalog tree.
+
+    Returns the apis sub-tree plus a flat list of (item_dict, price_sats)
+    slots — the dicts whose price_usd_cents depends on the live BTC price.
+    Config is parsed once at import and never reloaded, so this runs once.
+    """
     apis: Dict[str, Any] = {}
+    usd_slots: list = []
     for api_name, api_config in CONFIG.get("apis", {}).items():
         endpoints = []
         for endpoint in api_config.get("endpoints", []):
@@ -371,9 +718,7 @@ def _build_catalog(
             if endpoint.get("price_type") == "flat":
                 price_sats = int(endpoint.get("price_sats", 0))
                 item["price_sats"] = price_sats
-                usd_cents = _sats_to_usd_cents(price_sats, btc_usd)
-                if usd_cents is not None:
-                    item["price_usd_cents"] = usd_cents
+                usd_slots.append((item, price_sats))
             elif endpoint.get("price_type") == "per_model":
                 models: Dict[str, Any] = {}
                 for model_name, model_entry in endpoint.get("models", {}).items():
@@ -383,9 +728,7 @@ def _build_catalog(
                         price_sats = int(model_entry)
 
                     model_item: Dict[str, Any] = {"price_sats": price_sats}
-                    usd_cents = _sats_to_usd_cents(price_sats, btc_usd)
-                    if usd_cents is not None:
-                        model_item["price_usd_cents"] = usd_cents
+                    usd_slots.append((model_item, price_sats))
                     models[model_name] = model_item
 
                 item["models"] = models
@@ -396,13 +739,65 @@ def _build_catalog(
             "endpoints": endpoints,
         }
 
+    return apis, usd_slots
+
+
+_CATALOG_APIS, _CATALOG_USD_SLOTS = _build_catalog_static()
+
+
+def _build_catalog(
+    btc_usd: Optional[float],
+    btc_usd_updated_at: Optional[str],
+) -> Dict[str, Any]:
+    # Fill the USD price slots in place on the shared static tree. The result
+    # is serialized before the handler yields, so requests never observe a
+    # half-updated tree.
+    if btc_usd is None:
+        for item, _ in _CATALOG_USD_SLOTS:
+            item.pop("price_usd_cents", None)
+    else:
+        # Most slots share a handful of distinct prices; convert each
+        # distinct sats value once per rebuild.
+        usd_by_sats: Dict[int, float] = {}
+        for item, price_sats in _CATALOG_USD_SLOTS:
+            cents = usd_by_sats.get(price_sats)
+            if cents is None:
+                cents = usd_by_sats[price_sats] = _sats_to_usd_cents(
+                    price_sats, btc_usd
+                )
+            item["price_usd_cents"] = cents
+
     return {
         "btc_usd": btc_usd,
         "btc_usd_updated_at": btc_usd_updated_at,
-        "apis": apis,
+        "apis": _CATALOG_APIS,
     }
 
 
+# Serialized catalog plus ETag, rebuilt only when the BTC quote changes. The
+# quote refreshes at most every BTC_PRICE_CACHE_SECONDS, so between refreshes
+# the endpoint returns the same bytes (or a 304) without re-serializing.
+_catalog_cache_key: Optional[Tuple[Optional[float], Optional[str]]] = None
+_catalog_bytes: bytes = b""
+_catalog_etag: str = ""
+
+
+def _catalog_payload(
+    btc_usd: Optional[float],
+    btc_usd_updated_at: Optional[str],
+) -> Tuple[bytes, str]:
+    global _catalog_cache_key, _catalog_bytes, _catalog_etag
+    key = (btc_usd, btc_usd_updated_at)
+    if key != _catalog_cache_key:
+        body = orjson.dumps(_build_catalog(btc_usd, btc_usd_updated_at))
+        _catalog_bytes = body
+        _catalog_etag = (
+            '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+        )
+        _catalog_cache_key = key
+    return _catalog_bytes, _catalog_etag
+
+
 def _read_api_key(api_name: str, api_config: Dict[str, Any]) -> str:
     env_name = api_config.get("api_key_env", "")
     value = os.getenv(env_name, "")
@@ -411,35 +806,83 @@ def _read_api_key(api_name: str, api_config: Dict[str, Any]) -> str:
     return value
 
 
+@lru_cache(maxsize=None)
+def _upstream_base_headers(api_name: str) -> Dict[str, str]:
+    """Auth and extra headers for an upstream API; keys and config are fixed
+    for the process, so build the dict once per API. A missing key raises
+    RuntimeError, which lru_cache does not memoize."""
+    api_config = CONFIG.get("apis", {}).get(api_name, {})
+    headers = {
+        api_config.get("auth_header", "Authorization"): (
+            f"{api_config.get('auth_prefix', '')}"
+            f"{_read_api_key(api_name, api_config)}"
+        ),
+    }
+    headers.update(api_config.get("extra_headers", {}))
+    return headers
+
+
+# One keepalive HTTP/2-capable client for all upstream traffic, created on
+# first use and closed at shutdown. Reusing connections removes a TCP+TLS
+# handshake from every proxied request.
+_upstream_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_upstream_client() -> httpx.AsyncClient:
+    global _upstream_client
+    if _upstream_client is None:
+        _upstream_client = httpx.AsyncClient(
+            http2=True,
+            timeout=httpx.Timeout(180.0, connect=10.0),
+            # Limits must live on the transport: httpx ignores the client-level
+            # kwarg once an explicit transport is passed. Paid requests must
+            # never be silently replayed against the upstream, so retries stay
+            # at zero and transport errors surface to the caller.
+            transport=httpx.AsyncHTTPTransport(
+                retries=0,
+                http2=True,
+                limits=httpx.Limits(max_connections=256, max_keepalive_connections=64),
+            ),
+        )
+    return _upstream_client
+
+
+# Bytes template for the L402 challenge header; formatted with % so the 402
+# path skips an f-string plus the str->bytes conversion Starlette would do
+# when serializing headers.
+_WWW_AUTH_TPL = b'L402 macaroon="%b", invoice="%b"'
+
+# The 402 body is four known-safe fields (bolt11 and hex payment hash never
+# need JSON escaping), so it is rendered from a bytes template instead of
+# serializing a dict per request.
+_402_BODY_TPL = (
+    b'{"status":"payment_required","invoice":"%b","payment_hash":"%b",'
+    b'"amount_sats":%d,"expires_in":%d}'
+)
+
+
 def _create_l402_macaroon(
     payment_hash: str, amount_sats: int, account_id: Optional[str] = None,
 ) -> str:
-    macaroon = Macaroon(
-        location=L402_LOCATION,
-        identifier=payment_hash,
-        key=L402_ROOT_KEY,
-    )
-    macaroon.add_first_party_caveat(f"payment_hash={payment_hash}")
-    macaroon.add_first_party_caveat(f"amount_sats={amount_sats}")
+    caveats = [f"payment_hash={payment_hash}", f"amount_sats={amount_sats}"]
     if account_id:
-        macaroon.add_first_party_caveat(f"account_id={account_id}")
-    return macaroon.serialize()
+        caveats.append(f"account_id={account_id}")
+    return macaroons.mint(L402_LOCATION, payment_hash, caveats, _L402_DERIVED_KEY)
 
 
 def _parse_l402_authorization(auth_header: str) -> Tuple[str, str]:
-    prefix = "L402 "
-    if not auth_header.startswith(prefix):
+    # Single pass over the header with C-level startswith/rpartition — no
+    # regex engine on the hot path. Splits on the last colon (macaroons are
+    # base64url, preimages hex; neither contains one). Preimage hex/length
+    # validation stays in _hash_from_preimage so malformed preimages keep
+    # their error codes.
+    if not auth_header.startswith("L402 "):
         raise ValueError("Authorization header must start with 'L402 '")
-
-    payload = auth_header[len(prefix):].strip()
-    if ":" not in payload:
+    credentials = auth_header[5:].strip()
+    macaroon_b64, sep, preimage = credentials.rpartition(":")
+    if not sep or not macaroon_b64 or not preimage or " " in credentials:
         raise ValueError("Authorization header must be 'L402 <macaroon>:<preimage>'")
-
-    macaroon_b64, preimage = payload.rsplit(":", 1)
-    if not macaroon_b64.strip() or not preimage.strip():
-        raise ValueError("Authorization header must include macaroon and preimage")
-
-    return macaroon_b64.strip(), preimage.strip()
+    return macaroon_b64, preimage
 
 
 def _resolve_token(request: Request) -> Optional[str]:
@@ -450,18 +893,12 @@ def _resolve_token(request: Request) -> Optional[str]:
     return None
 
 
-def _extract_l402_caveats(macaroon: Macaroon) -> Tuple[str, int, Optional[str]]:
+def _extract_l402_caveats(caveats: list[str]) -> Tuple[str, int, Optional[str]]:
     payment_hash: Optional[str] = None
     amount_sats: Optional[int] = None
     account_id: Optional[str] = None
 
-    for caveat in macaroon.caveats:
-        caveat_id = getattr(caveat, "caveat_id", "")
-        if isinstance(caveat_id, bytes):
-            caveat_str = caveat_id.decode("utf-8", "ignore")
-        else:
-            caveat_str = str(caveat_id)
-
+    for caveat_str in caveats:
         key, sep, value = caveat_str.partition("=")
         if sep != "=":
             continue
@@ -490,110 +927,126 @@ def _extract_l402_caveats(macaroon: Macaroon) -> Tuple[str, int, Optional[str]]:
     return payment_hash, amount_sats, account_id
 
 
+# Valid verifications memoized for the invoice lifetime — the paid retry
+# presents the exact macaroon string the 402 handed out, so it skips the
+# HMAC chain. Unlike lru_cache, entries expire: a macaroon whose invoice
+# lapsed stops occupying memory. Invalid inputs are never cached.
+_MACAROON_CACHE: Dict[str, Tuple[float, Tuple[str, int, Optional[str]]]] = {}
+_MACAROON_CACHE_MAX = 4096
+
+
 def _verify_l402_macaroon(macaroon_b64: str) -> Tuple[str, int, Optional[str]]:
+    now = time.monotonic()
+    hit = _MACAROON_CACHE.get(macaroon_b64)
+    if hit is not None:
+        expires_at, result = hit
+        if expires_at > now:
+            return result
+        del _MACAROON_CACHE[macaroon_b64]
+
     try:
-        macaroon = Macaroon.deserialize(macaroon_b64)
+        parsed = macaroons.parse(macaroon_b64)
     except Exception as exc:
         raise ValueError("Invalid macaroon format") from exc
 
-    verifier = Verifier()
-    verifier.satisfy_general(lambda _: True)
-    try:
-        verifier.verify(macaroon, L402_ROOT_KEY)
-    except Exception as exc:
-        raise ValueError("Invalid macaroon signature") from exc
+    if not macaroons.verify(parsed, _L402_DERIVED_KEY):
+        raise ValueError("Invalid macaroon signature")
 
-    return _extract_l402_caveats(macaroon)
+    result = _extract_l402_caveats(parsed.caveats)
+    if len(_MACAROON_CACHE) >= _MACAROON_CACHE_MAX:
+        for key, (expires_at, _) in list(_MACAROON_CACHE.items()):
+            if expires_at <= now:
+                del _MACAROON_CACHE[key]
+        if len(_MACAROON_CACHE) >= _MACAROON_CACHE_MAX:
+            _MACAROON_CACHE.clear()
+    _MACAROON_CACHE[macaroon_b64] = (now + _INVOICE_EXPIRY, result)
+    return result
 
 
 async def _proxy_upstream(
     api_name: str,
     normalized_path: str,
-    api_config: Dict[str, Any],
     endpoint_config: Dict[str, Any],
     request_bytes: bytes,
     request_content_type: str,
+    accept_encoding: Optional[str] = None,
+    wants_stream: bool = False,
 ) -> Response:
-    upstream_url = f"{api_config.get('upstream_base', '').rstrip('/')}{normalized_path}"
-    if not upstream_url.startswith("http"):
+    # URL, method, and timeout were denormalized onto the endpoint at import.
+    upstream_url = endpoint_config.get("_upstream_url", "")
+    if not upstream_url:
         return _build_error(502, "upstream_error", "Invalid upstream URL")
 
     try:
-        api_key = _read_api_key(api_name, api_config)
+        headers = dict(_upstream_base_headers(api_name))
     except RuntimeError as exc:
         return _build_error(502, "upstream_error", str(exc))
 
-    headers = {
-        api_config.get("auth_header", "Authorization"): (
-            f"{api_config.get('auth_prefix', '')}{api_key}"
-        ),
-        "Content-Type": request_content_type or "application/octet-stream",
-    }
-    headers.update(api_config.get("extra_headers", {}))
-
-    method = endpoint_config.get("method", "POST").upper()
-    wants_stream = False
-    if normalized_path in {"/v1/chat/completions", "/v1/responses"}:
-        try:
-            payload = json.loads(request_bytes.decode("utf-8"))
-            wants_stream = bool(payload.get("stream"))
-        except Exception:
-            wants_stream = False
-
+    headers["Content-Type"] = request_content_type or "application/octet-stream"
+    # Forward the client's Accept-Encoding and relay the upstream body
+    # verbatim, so compressed payloads cross the proxy without a
+    # decompress/recompress round trip. A client that sent no preference
+    # must pin identity — otherwise httpx advertises gzip on its own and
+    # the raw relay would hand compressed bytes to a client that never
+    # negotiated them.
+    headers["Accept-Encoding"] = accept_encoding or "identity"
+
+    client = _get_upstream_client()
+    method = endpoint_config["_method"]
     if wants_stream:
-        stream_client = httpx.AsyncClient(timeout=None)
-        stream_cm = stream_client.stream(
-            method=method,
-            url=upstream_url,
-            content=request_bytes,
-            headers=headers,
-        )
-        try:
-            upstream_response = await stream_cm.__aenter__()
-        except httpx.HTTPError as exc:
-            await stream_client.aclose()
-            return _build_error(502, "upstream_error", f"Upstream request failed: {exc}")
-
-        content_type = upstream_response.headers.get("content-type", "text/event-stream")
-
-        async def stream_chunks() -> AsyncIterator[bytes]:
-            try:
-                async for chunk in upstream_response.aiter_bytes():
-                    yield chunk
-            finally:
-                await stream_cm.__aexit__(None, None, None)
-                await stream_client.aclose()
-
-        return StreamingResponse(
-            stream_chunks(),
-            status_code=upstream_response.status_code,
-            media_type=content_type,
-        )
-
-    slow_paths = {
-        "/v1/video/generations",
-        "/v1/responses",
-        "/v1/images/generations",
-        "/v1/images/edits",
-    }
-    upstream_timeout = 600 if normalized_path in slow_paths else 180
-
+        upstream_timeout = None
+        default_content_type = "text/event-stream"
+    else:
+        upstream_timeout = endpoint_config["_upstream_timeout"]
+        default_content_type = "application/json"
+
+    # Always relay the upstream body chunk by chunk: per-request memory stays
+    # at one chunk regardless of payload size, and the event loop is free
+    # between chunks. The price is that an upstream failure after headers are
+    # sent truncates the stream instead of producing a 502.
+    stream_cm = client.stream(
+        method=method,
+        url=upstream_url,
+        content=request_bytes,
+        headers=headers,
+        timeout=upstream_timeout,
+    )
     try:
-        async with httpx.AsyncClient(timeout=upstream_timeout) as client:
-            upstream_response = await client.request(
-                method=method,
-                url=upstream_url,
-                content=request_bytes,
-                headers=headers,
-            )
+        upstream_response = await stream_cm.__aenter__()
     except httpx.HTTPError as exc:
         return _build_error(502, "upstream_error", f"Upstream request failed: {exc}")
 
-    content_type = upstream_response.headers.get("content-type", "application/json")
-    return Response(
-        content=upstream_response.content,
+    content_type = upstream_response.headers.get("content-type", default_content_type)
+    response_headers = {}
+    content_encoding = upstream_response.headers.get("content-encoding")
+    if content_encoding:
+        response_headers["content-encoding"] = content_encoding
+
+    async def stream_chunks() -> AsyncIterator[bytes]:
+        # 64 KiB reads: fewer coroutine resumptions per MB than the
+        # default, while SSE chunks still flush as soon as they arrive.
+        try:
+            async for chunk in upstream_response.aiter_raw(chunk_size=65536):
+                yield chunk
+        except BaseException:
+            # Starlette skips the background task when the body iterator
+            # raises, so a mid-body upstream failure (read timeout,
+            # connection reset) must release the connection here or it
+            # stays checked out of the pool forever.
+            await stream_cm.__aexit__(None, None, None)
+            raise
+
+    # Closing via the response's background task ties the upstream
+    # connection's release to the ASGI response lifecycle: it runs as soon
+    # as the response ends — finished or client-disconnected — rather than
+    # whenever the abandoned generator happens to be finalized. Close is
+    # idempotent, so the error path above doubling up is harmless.
+    return StreamingResponse(
+        stream_chunks(),
         status_code=upstream_response.status_code,
         media_type=content_type,
+        headers=response_headers or None,
+        background=BackgroundTask(stream_cm.__aexit__, None, None, None),
     )
 
 
@@ -608,82 +1061,218 @@ if not L402_ROOT_KEY:
         "WARNING: L402_ROOT_KEY is not set. Generated an ephemeral key; "
         "set L402_ROOT_KEY in .env for stable macaroon verification across restarts."
     )
+# Macaroon signing key derivation is an extra HMAC per mint; the root key is
+# fixed for the process, so derive once here.
+_L402_DERIVED_KEY = macaroons.derive_key(L402_ROOT_KEY.encode("utf-8"))
+
+def _configured_price_tiers() -> set[int]:
+    """Distinct price_sats values across all configured endpoints/models."""
+    tiers: set[int] = set()
+    for api_config in CONFIG.get("apis", {}).values():
+        for endpoint in api_config.get("endpoints", []):
+            if endpoint.get("price_type") == "flat":
+                tiers.add(int(endpoint.get("price_sats", 0)))
+            elif endpoint.get("price_type") == "per_model":
+                for model_entry in endpoint.get("models", {}).values():
+                    if isinstance(model_entry, dict):
+                        tiers.add(int(model_entry.get("price_sats", 0)))
+                    else:
+                        tiers.add(int(model_entry))
+    tiers.discard(0)
+    return tiers
 
-USED_HASH_TTL_SECONDS = int(CONFIG.get("used_hash_ttl_seconds", 3600))
-USED_HASH_CLEANUP_SECONDS = int(CONFIG.get("used_hash_cleanup_interval_seconds", 300))
-used_hashes = UsedHashSet(
-    ttl_seconds=USED_HASH_TTL_SECONDS,
-    cleanup_interval_seconds=USED_HASH_CLEANUP_SECONDS,
+
+invoice_pool = InvoicePool(
+    phoenix_client,
+    expiry_seconds=_INVOICE_EXPIRY,
 )
+
+USED_HASH_TTL_SECONDS = int(CONFIG.get("used_hash_ttl_seconds", 3600))
+used_hashes = UsedHashSet(ttl_seconds=USED_HASH_TTL_SECONDS)
 topup_store = SupabaseTopupStore.from_env()
 
+# Whether X-Token auth is live for this deployment. Fixed once at startup so
+# the proxy hot path branches on a module global instead of re-asking the
+# store on every request; deployments without Supabase never flip it.
+_token_auth_enabled = False
+
 BTC_PRICE_SOURCE = CONFIG.get("btc_price", {}).get(
     "source",
     "https://api.coingecko.com/api/v3/simple/price?ids=bitcoin&vs_currencies=usd",
 )
 BTC_PRICE_CACHE_SECONDS = int(CONFIG.get("btc_price", {}).get("cache_seconds", 300))
 _btc_usd_price: Optional[float] = None
-_btc_usd_updated_at: float = 0.0
-_btc_usd_lock = asyncio.Lock()
+_btc_usd_updated_iso: Optional[str] = None
+# Expiry is tracked on the monotonic clock (immune to wall-clock steps); the
+# ISO timestamp clients see is formatted once per refresh, not per read.
+_btc_usd_mono: float = float("-inf")
+# Single-flight refresh: concurrent cache misses all await the same task, so
+# a burst at expiry costs one upstream call and no lock queue.
+_btc_refresh_task: Optional["asyncio.Task[None]"] = None
+
+
+async def _refresh_btc_usd() -> None:
+    global _btc_usd_price, _btc_usd_updated_iso, _btc_usd_mono
+    try:
+        # Rides the shared keepalive pool; the quote API gets a short
+        # per-request timeout instead of the proxy's long default.
+        response = await _get_upstream_client().get(
+            str(BTC_PRICE_SOURCE), timeout=8.0
+        )
+        response.raise_for_status()
+        payload = response.json()
+        maybe_price = payload.get("bitcoin", {}).get("usd")
+        if maybe_price is not None:
+            _btc_usd_price = float(maybe_price)
+            _btc_usd_updated_iso = _utc_timestamp_iso(time.time())
+            _btc_usd_mono = time.monotonic()
+    except Exception:
+        # Quote stays stale/absent; callers degrade to sats-only prices.
+        pass
+
+
+async def _price_refresh_worker() -> None:
+    # Refreshing at half the TTL keeps the quote perpetually warm, so catalog
+    # requests read module state instead of ever waiting on the quote API.
+    interval = max(BTC_PRICE_CACHE_SECONDS // 2, 1)
+    while True:
+        await asyncio.sleep(interval)
+        await _refresh_btc_usd()
 
 
 async def _get_cached_btc_usd() -> Tuple[Optional[float], Optional[str]]:
-    global _btc_usd_price, _btc_usd_updated_at
+    # With the background worker running this is a pure cache read; the
+    # single-flight miss path below only fires before the first prefetch
+    # lands or if the worker's last refreshes failed past the TTL.
+    global _btc_refresh_task
 
-    now = time.time()
-    if _btc_usd_price is not None and now - _btc_usd_updated_at < BTC_PRICE_CACHE_SECONDS:
-        return _btc_usd_price, _utc_timestamp_iso(_btc_usd_updated_at)
+    if (
+        _btc_usd_price is not None
+        and time.monotonic() - _btc_usd_mono < BTC_PRICE_CACHE_SECONDS
+    ):
+        return _btc_usd_price, _btc_usd_updated_iso
 
-    async with _btc_usd_lock:
-        now = time.time()
-        if _btc_usd_price is not None and now - _btc_usd_updated_at < BTC_PRICE_CACHE_SECONDS:
-            return _btc_usd_price, _utc_timestamp_iso(_btc_usd_updated_at)
+    if _btc_refresh_task is None or _btc_refresh_task.done():
+        _btc_refresh_task = asyncio.create_task(_refresh_btc_usd())
+    # Awaiting the shared task does not cancel it if this request dies; the
+    # refresh itself never raises.
+    await _btc_refresh_task
+    return _btc_usd_price, _btc_usd_updated_iso
 
-        try:
-            async with httpx.AsyncClient(timeout=8) as client:
-                response = await client.get(str(BTC_PRICE_SOURCE))
-                response.raise_for_status()
-                payload = response.json()
-            maybe_price = payload.get("bitcoin", {}).get("usd")
-            if maybe_price is not None:
-                _btc_usd_price = float(maybe_price)
-                _btc_usd_updated_at = now
-        except Exception:
-            pass
+app = FastAPI(title="alittlebitofmoney", default_response_class=ORJSONResponse)
 
-    return _btc_usd_price, _utc_timestamp_iso(_btc_usd_updated_at)
+# Locally generated JSON (catalog, docs, hire listings) compresses well; the
+# middleware leaves proxied bodies alone when the upstream already set a
+# Content-Encoding and never touches text/event-stream, so streamed
+# completions pass through untouched.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
-app = FastAPI(title="alittlebitofmoney")
 
-hire_store: Optional[HireStore] = None
-_cleanup_task: Optional[asyncio.Task[None]] = None
+@app.exception_handler(ApiError)
+async def _api_error_handler(request: Request, exc: ApiError) -> Response:
+    return _build_error(exc.status_code, exc.code, exc.message)
 
 
-async def _cleanup_worker() -> None:
-    while True:
-        await asyncio.sleep(USED_HASH_CLEANUP_SECONDS)
-        used_hashes.cleanup()
+@app.exception_handler(RequestValidationError)
+async def _request_validation_handler(
+    request: Request, exc: RequestValidationError
+) -> Response:
+    # Typed path/query parameters that fail to parse should speak the same
+    # error envelope as everything else, not FastAPI's default 422 shape.
+    return _build_error(400, "invalid_request", "Invalid request parameters")
+
+
+class _BodyModel(BaseModel):
+    """
+    Base for request-body models.
+
+    pydantic-core parses and validates the raw bytes in one pass (Rust JSON
+    parser), replacing the stdlib json.loads + per-field isinstance/int/strip
+    cascades the handlers used to carry. Failures are mapped onto the
+    service's error envelope rather than FastAPI's default 422 shape;
+    subclasses list their per-field (code, message) pairs in _FIELD_ERRORS.
+    """
+
+    model_config = ConfigDict(extra="ignore")
+
+    _FIELD_ERRORS: ClassVar[Dict[str, Tuple[str, str]]] = {}
+
+    @classmethod
+    def from_body(cls, raw: bytes) -> "_BodyModel":
+        try:
+            return cls.model_validate_json(raw)
+        except ValidationError as exc:
+            raise cls._envelope_error(exc) from None
+
+    @classmethod
+    def _envelope_error(cls, exc: ValidationError) -> ApiError:
+        first = exc.errors(include_url=False)[0]
+        if first.get("type") == "json_invalid":
+            return ApiError(400, "invalid_request", "Request body must be JSON")
+        loc = first.get("loc")
+        if not loc:
+            return ApiError(400, "invalid_request", "Request body must be a JSON object")
+        code, message = cls._FIELD_ERRORS.get(
+            loc[0], ("invalid_request", "Invalid request body")
+        )
+        return ApiError(400, code, message)
+
+
+def _body(model: Type[_BodyModel]) -> Callable[[Request], Any]:
+    """Dependency that parses the request body into the given model."""
+    async def dep(request: Request) -> _BodyModel:
+        return model.from_body(await request.body())
+    return dep
+
+hire_store: Optional[HireStore] = None
+_price_worker: Optional["asyncio.Task[None]"] = None
 
 
 @app.on_event("startup")
 async def startup() -> None:
-    global _cleanup_task, hire_store
+    global hire_store, _token_auth_enabled, _price_worker
+    # phoenixd RPCs ride the shared keepalive pool so invoice creation and
+    # payouts skip a TCP handshake per call.
+    phoenix_client.attach_client(_get_upstream_client())
     await topup_store.startup()
+    _token_auth_enabled = topup_store.ready
     if topup_store.pool is not None:
         hire_store = HireStore(topup_store.pool)
         await hire_store.ensure_schema()
         print("Hire store initialized")
-    _cleanup_task = asyncio.create_task(_cleanup_worker())
+    for tier in _configured_price_tiers():
+        invoice_pool.register_tier(tier)
+    # Hire write endpoints issue their own 402 challenges at fixed prices
+    # (50-sat task post, 10-sat quote), so pre-warm those tiers too.
+    invoice_pool.register_tier(50)
+    invoice_pool.register_tier(10)
+    invoice_pool.start()
+    # Warm the per-API header cache and surface missing upstream keys at
+    # boot instead of as 502s on the first paid request.
+    for _startup_api_name in _API_CONFIGS:
+        try:
+            _upstream_base_headers(_startup_api_name)
+        except RuntimeError as exc:
+            print(f"WARNING: {exc}")
+    # Prefetch the BTC quote before serving, then keep it warm in the
+    # background so catalog requests never block on the quote API.
+    await _refresh_btc_usd()
+    _price_worker = asyncio.create_task(_price_refresh_worker())
 
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
-    if _cleanup_task is not None:
-        _cleanup_task.cancel()
+    global _price_worker
+    if _price_worker is not None:
+        _price_worker.cancel()
         try:
-            await _cleanup_task
+            await _price_worker
         except asyncio.CancelledError:
             pass
+        _price_worker = None
+    await invoice_pool.stop()
+    if _upstream_client is not None:
+        await _upstream_client.aclose()
     await topup_store.shutdown()
 
 
@@ -693,9 +1282,16 @@ async def root() -> Response:
 
 
 @app.get("/api/v1/catalog")
-async def api_catalog() -> Dict[str, Any]:
+async def api_catalog(request: Request) -> Response:
     btc_usd, btc_usd_updated_at = await _get_cached_btc_usd()
-    return _build_catalog(btc_usd, btc_usd_updated_at)
+    body, etag = _catalog_payload(btc_usd, btc_usd_updated_at)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"etag": etag})
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"etag": etag},
+    )
 
 
 # ── Machine-readable documentation endpoints ──────────────────────
@@ -703,64 +1299,65 @@ async def api_catalog() -> Dict[str, Any]:
 
 def _build_llms_txt() -> str:
     """Build plain-text LLM-readable documentation from config."""
-    lines = [
-        "# aiforhire.xyz — AI API Gateway (Lightning L402)",
-        "",
-        "> Pay-per-request AI APIs. No signup, no API key.",
-        "> Pay with Bitcoin Lightning. All endpoints 10 sats (promo).",
-        "",
-        "## Authentication",
-        "",
-        "Every API call uses the L402 protocol (Lightning HTTP 402):",
-        "",
-        "1. Send your request (no auth header needed on first call)",
-        "2. Receive HTTP 402 with a Lightning invoice in the response body",
-        "3. Pay the invoice with any Lightning wallet to get a preimage",
-        "4. Resend the same request with header:",
-        '   Authorization: L402 <macaroon>:<preimage>',
-        "",
-        "The macaroon and invoice are returned in the 402 response.",
-        "The preimage is the proof-of-payment from your Lightning wallet.",
-        "",
-        "### Example (curl)",
-        "",
-        "```bash",
-        "# Step 1: Get invoice",
-        'RESP=$(curl -s https://aiforhire.xyz/api/v1/openai/v1/chat/completions \\',
-        "  -H 'Content-Type: application/json' \\",
-        '  -d \'{"model":"gpt-4o-mini","messages":[{"role":"user","content":"Hello"}]}\')',
-        "",
-        "# Step 2: Pay the invoice from the response, get preimage",
-        "# Step 3: Resend with L402 auth",
-        'curl https://aiforhire.xyz/api/v1/openai/v1/chat/completions \\',
-        "  -H 'Content-Type: application/json' \\",
-        "  -H 'Authorization: L402 <macaroon>:<preimage>' \\",
-        '  -d \'{"model":"gpt-4o-mini","messages":[{"role":"user","content":"Hello"}]}\'',
-        "```",
-        "",
-        "## Endpoints",
-        "",
-    ]
+    buf = io.StringIO()
+    buf.write(
+        """\
+# aiforhire.xyz — AI API Gateway (Lightning L402)
+
+> Pay-per-request AI APIs. No signup, no API key.
+> Pay with Bitcoin Lightning. All endpoints 10 sats (promo).
+
+## Authentication
+
+Every API call uses the L402 protocol (Lightning HTTP 402):
+
+1. Send your request (no auth header needed on first call)
+2. Receive HTTP 402 with a Lightning invoice in the response body
+3. Pay the invoice with any Lightning wallet to get a preimage
+4. Resend the same request with header:
+   Authorization: L402 <macaroon>:<preimage>
+
+The macaroon and invoice are returned in the 402 response.
+The preimage is the proof-of-payment from your Lightning wallet.
+
+### Example (curl)
+
+```bash
+# Step 1: Get invoice
+RESP=$(curl -s https://aiforhire.xyz/api/v1/openai/v1/chat/completions \\
+  -H 'Content-Type: application/json' \\
+  -d '{"model":"gpt-4o-mini","messages":[{"role":"user","content":"Hello"}]}')
+
+# Step 2: Pay the invoice from the response, get preimage
+# Step 3: Resend with L402 auth
+curl https://aiforhire.xyz/api/v1/openai/v1/chat/completions \\
+  -H 'Content-Type: application/json' \\
+  -H 'Authorization: L402 <macaroon>:<preimage>' \\
+  -d '{"model":"gpt-4o-mini","messages":[{"role":"user","content":"Hello"}]}'
+```
+
+## Endpoints
+
+"""
+    )
 
     for api_name, api_config in CONFIG.get("apis", {}).items():
         provider_name = api_config.get("name", api_name)
-        lines.append(f"### {provider_name}")
-        lines.append("")
+        buf.write(f"### {provider_name}\n\n")
         for endpoint in api_config.get("endpoints", []):
             path = endpoint.get("path", "")
             method = endpoint.get("method", "POST")
             desc = endpoint.get("description", "")
-            full_path = f"/api/v1/{api_name}{path}"
-            lines.append(f"- **{method} {full_path}** — {desc}")
+            buf.write(f"- **{method} /api/v1/{api_name}{path}** — {desc}\n")
 
             if endpoint.get("price_type") == "flat":
                 price = endpoint.get("price_sats", 10)
-                lines.append(f"  Price: {price} sats (flat)")
+                buf.write(f"  Price: {price} sats (flat)\n")
             elif endpoint.get("price_type") == "per_model":
                 models = endpoint.get("models", {})
                 model_names = [m for m in models if m != "_default"]
                 if model_names:
-                    lines.append(f"  Models: {', '.join(model_names)}")
+                    buf.write(f"  Models: {', '.join(model_names)}\n")
                     prices = set()
                     for m, entry in models.items():
                         if m == "_default":
@@ -768,31 +1365,68 @@ def _build_llms_txt() -> str:
                         p = entry.get("price_sats", 10) if isinstance(entry, dict) else int(entry)
                         prices.add(p)
                     if len(prices) == 1:
-                        lines.append(f"  Price: {prices.pop()} sats per request")
+                        buf.write(f"  Price: {prices.pop()} sats per request\n")
                     else:
-                        lines.append(f"  Price: {min(prices)}-{max(prices)} sats per request")
+                        buf.write(f"  Price: {min(prices)}-{max(prices)} sats per request\n")
 
-            lines.append("")
+            buf.write("\n")
 
-    lines.extend([
-        "## Rate Limits (Promo Period)",
-        "",
-        "Daily caps per endpoint (resets at midnight UTC):",
-    ])
+    buf.write(
+        """\
+## Rate Limits (Promo Period)
+
+Daily caps per endpoint (rolling 24-hour window):
+"""
+    )
     for path, limit in DAILY_RATE_LIMITS.items():
         if path == "_default":
-            lines.append(f"- All other endpoints: {limit}/day")
+            buf.write(f"- All other endpoints: {limit}/day\n")
         else:
-            lines.append(f"- {path}: {limit}/day")
-    lines.append("")
-    lines.append("## More Info")
-    lines.append("")
-    lines.append("- Website: https://aiforhire.xyz")
-    lines.append("- OpenAPI spec: https://aiforhire.xyz/openapi.json")
-    lines.append("- AI plugin manifest: https://aiforhire.xyz/.well-known/ai-plugin.json")
-    lines.append("")
+            buf.write(f"- {path}: {limit}/day\n")
+    buf.write(
+        """
+## More Info
+
+- Website: https://aiforhire.xyz
+- OpenAPI spec: https://aiforhire.xyz/openapi.json
+- AI plugin manifest: https://aiforhire.xyz/.well-known/ai-plugin.json
+"""
+    )
+
+    return buf.getvalue()
+
+
+# llms.txt depends only on config, which is read once at import — render once.
+_LLMS_TXT_BYTES = _build_llms_txt().encode("utf-8")
+_LLMS_TXT_ETAG = (
+    '"' + hashlib.blake2b(_LLMS_TXT_BYTES, digest_size=16).hexdigest() + '"'
+)
+
 
-    return "\n".join(lines)
+# Identical across every operation; the spec is serialized once and never
+# mutated afterwards, so all operations can share the same objects.
+_OPENAPI_SECURITY = [{"L402": []}]
+_OPENAPI_RESPONSES = {
+    "200": {"description": "Successful response (format varies by endpoint)"},
+    "402": {
+        "description": "Payment required — pay the Lightning invoice to proceed",
+        "content": {
+            "application/json": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "payment_hash": {"type": "string"},
+                        "invoice": {"type": "string", "description": "Lightning BOLT11 invoice"},
+                        "amount_sats": {"type": "integer"},
+                        "macaroon": {"type": "string"},
+                        "description": {"type": "string"},
+                    },
+                },
+            }
+        },
+    },
+    "429": {"description": "Daily rate limit exceeded"},
+}
 
 
 def _build_openapi_spec() -> Dict[str, Any]:
@@ -855,28 +1489,8 @@ def _build_openapi_spec() -> Dict[str, Any]:
             operation: Dict[str, Any] = {
                 "summary": desc,
                 "operationId": f"{api_name}_{ep_path.strip('/').replace('/', '_')}",
-                "security": [{"L402": []}],
-                "responses": {
-                    "200": {"description": "Successful response (format varies by endpoint)"},
-                    "402": {
-                        "description": "Payment required — pay the Lightning invoice to proceed",
-                        "content": {
-                            "application/json": {
-                                "schema": {
-                                    "type": "object",
-                                    "properties": {
-                                        "payment_hash": {"type": "string"},
-                                        "invoice": {"type": "string", "description": "Lightning BOLT11 invoice"},
-                                        "amount_sats": {"type": "integer"},
-                                        "macaroon": {"type": "string"},
-                                        "description": {"type": "string"},
-                                    },
-                                },
-                            }
-                        },
-                    },
-                    "429": {"description": "Daily rate limit exceeded"},
-                },
+                "security": _OPENAPI_SECURITY,
+                "responses": _OPENAPI_RESPONSES,
             }
             if request_body:
                 operation["requestBody"] = request_body
@@ -953,18 +1567,32 @@ def _build_ai_plugin_manifest() -> Dict[str, Any]:
 
 
 @app.get("/llms.txt", include_in_schema=False)
-async def llms_txt() -> Response:
-    return Response(content=_build_llms_txt(), media_type="text/plain; charset=utf-8")
+async def llms_txt(request: Request) -> Response:
+    if request.headers.get("if-none-match") == _LLMS_TXT_ETAG:
+        return Response(status_code=304, headers={"etag": _LLMS_TXT_ETAG})
+    return Response(
+        content=_LLMS_TXT_BYTES,
+        media_type="text/plain; charset=utf-8",
+        headers={"etag": _LLMS_TXT_ETAG},
+    )
+
+
+# The spec depends only on config, so serialize it once at import.
+_OPENAPI_BYTES = orjson.dumps(_build_openapi_spec())
 
 
 @app.get("/openapi.json", include_in_schema=False)
-async def openapi_spec() -> JSONResponse:
-    return JSONResponse(content=_build_openapi_spec())
+async def openapi_spec() -> Response:
+    return Response(content=_OPENAPI_BYTES, media_type="application/json")
+
+
+# Like the OpenAPI spec, the manifest is immutable; serialize it once.
+_PLUGIN_BYTES = orjson.dumps(_build_ai_plugin_manifest())
 
 
 @app.get("/.well-known/ai-plugin.json", include_in_schema=False)
-async def ai_plugin_manifest() -> JSONResponse:
-    return JSONResponse(content=_build_ai_plugin_manifest())
+async def ai_plugin_manifest() -> Response:
+    return Response(content=_PLUGIN_BYTES, media_type="application/json")
 
 
 @app.get("/api/v1/health")
@@ -976,7 +1604,7 @@ async def health() -> Response:
     except PhoenixError as exc:
         phoenix_status = {"ok": False, "error": str(exc)}
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=200,
         content={
             "status": "ok",
@@ -988,23 +1616,60 @@ async def health() -> Response:
     )
 
 
+# Static at deploy time; read once so the handler skips the stat + read
+# syscalls per request. None means the file is absent on this deployment.
+try:
+    _SATRING_VERIFY_BYTES: Optional[bytes] = SATRING_VERIFY_PATH.read_bytes()
+except OSError:
+    _SATRING_VERIFY_BYTES = None
+
+
 @app.get("/.well-known/satring-verify")
 async def satring_verify() -> Response:
-    if not SATRING_VERIFY_PATH.exists():
+    if _SATRING_VERIFY_BYTES is None:
         return _build_error(404, "not_found", "Route not found")
+    return Response(content=_SATRING_VERIFY_BYTES, media_type="text/plain")
 
-    try:
-        payload = SATRING_VERIFY_PATH.read_text(encoding="utf-8")
-    except Exception:
-        return _build_error(500, "server_error", "Could not read verification payload")
 
-    return Response(content=payload, media_type="text/plain")
+class CreateTopupBody(_BodyModel):
+    amount_sats: PositiveInt
+
+    _FIELD_ERRORS = {
+        "amount_sats": ("invalid_amount", "amount_sats must be a positive integer"),
+    }
+
+
+class ClaimTopupBody(_BodyModel):
+    preimage: str
+    token: Optional[str] = None
+
+    _FIELD_ERRORS = {
+        "preimage": ("invalid_payment", "Missing preimage"),
+        "token": ("invalid_token", "token must be a non-empty string"),
+    }
+
+    @field_validator("preimage")
+    @classmethod
+    def _preimage_not_blank(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("Missing preimage")
+        return value
+
+    @field_validator("token")
+    @classmethod
+    def _token_stripped(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        value = value.strip()
+        if not value:
+            raise ValueError("token must be a non-empty string")
+        return value
 
 
 @app.post("/api/v1/topup")
 async def create_topup_invoice(request: Request) -> Response:
     if not topup_store.ready:
-        return _build_error(503, "topup_unavailable", "Topup service is not configured")
+        return _TOPUP_UNAVAILABLE
 
     token = _resolve_token(request)
     account_id: Optional[str] = None
@@ -1014,23 +1679,10 @@ async def create_topup_invoice(request: Request) -> Response:
         except TopupInvalidToken:
             return _build_error(401, "invalid_token", "Unknown X-Token")
         except RuntimeError:
-            return _build_error(503, "topup_unavailable", "Topup service is not configured")
-
-    try:
-        payload = await request.json()
-    except Exception:
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
-
-    if not isinstance(payload, dict):
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
+            return _TOPUP_UNAVAILABLE
 
-    amount_raw = payload.get("amount_sats")
-    try:
-        amount_sats = int(amount_raw)
-    except (TypeError, ValueError):
-        return _build_error(400, "invalid_amount", "amount_sats must be a positive integer")
-    if amount_sats <= 0:
-        return _build_error(400, "invalid_amount", "amount_sats must be a positive integer")
+    body = CreateTopupBody.from_body(await request.body())
+    amount_sats = body.amount_sats
 
     try:
         created_invoice = await phoenix_client.create_invoice(
@@ -1052,10 +1704,10 @@ async def create_topup_invoice(request: Request) -> Response:
             account_id=account_id,
         )
     except RuntimeError:
-        return _build_error(503, "topup_unavailable", "Topup service is not configured")
+        return _TOPUP_UNAVAILABLE
 
-    expires_in = int(CONFIG.get("invoice_expiry", 600))
-    response = JSONResponse(
+    expires_in = _INVOICE_EXPIRY
+    response = ORJSONResponse(
         status_code=402,
         content={
             "status": "payment_required",
@@ -1067,39 +1719,27 @@ async def create_topup_invoice(request: Request) -> Response:
             "claim_url": "/api/v1/topup/claim",
         },
     )
-    response.headers["X-Lightning-Invoice"] = invoice
-    response.headers["X-Payment-Hash"] = payment_hash
-    response.headers["X-Price-Sats"] = str(amount_sats)
-    response.headers["X-Topup-Claim-URL"] = "/api/v1/topup/claim"
+    response.raw_headers.extend([
+        (b"x-lightning-invoice", invoice.encode("ascii")),
+        (b"x-payment-hash", payment_hash.encode("ascii")),
+        (b"x-price-sats", _SATS_BYTES.get(amount_sats) or str(amount_sats).encode("ascii")),
+        (b"x-topup-claim-url", b"/api/v1/topup/claim"),
+    ])
     return response
 
 
 @app.post("/api/v1/topup/claim")
 async def claim_topup_invoice(request: Request) -> Response:
     if not topup_store.ready:
-        return _build_error(503, "topup_unavailable", "Topup service is not configured")
-
-    try:
-        payload = await request.json()
-    except Exception:
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
-
-    if not isinstance(payload, dict):
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
-
-    preimage = payload.get("preimage")
-    if not isinstance(preimage, str) or not preimage.strip():
-        return _build_error(400, "invalid_payment", "Missing preimage")
+        return _TOPUP_UNAVAILABLE
 
-    raw_token = payload.get("token")
-    token: Optional[str] = None
-    if raw_token is not None:
-        if not isinstance(raw_token, str) or not raw_token.strip():
-            return _build_error(400, "invalid_token", "token must be a non-empty string")
-        token = raw_token.strip()
+    body = ClaimTopupBody.from_body(await request.body())
+    preimage = body.preimage
+    token = body.token
 
     try:
-        payment_hash = _canonical_hash(_hash_from_preimage(preimage))
+        # hexdigest() is already lowercase, i.e. canonical.
+        payment_hash = _hash_from_preimage(preimage)
     except ValueError as exc:
         return _build_error(400, "invalid_payment", str(exc))
 
@@ -1117,9 +1757,9 @@ async def claim_topup_invoice(request: Request) -> Response:
     except TopupMissingToken:
         return _build_error(400, "missing_token", "token is required to claim refill invoices")
     except RuntimeError:
-        return _build_error(503, "topup_unavailable", "Topup service is not configured")
+        return _TOPUP_UNAVAILABLE
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=200,
         content={
             "token": claim.token,
@@ -1128,105 +1768,113 @@ async def claim_topup_invoice(request: Request) -> Response:
     )
 
 
-def _require_hire() -> HireStore:
-    if hire_store is None:
-        raise RuntimeError("hire service not available")
-    return hire_store
-
-
 # ── AI for Hire auth: X-Token (identity) + L402 (payment) ────────
 
+@dataclass(slots=True, frozen=True)
 class _HireAuth:
-    """Result of hire auth resolution."""
-    __slots__ = ("account_id", "method", "l402_amount_sats", "l402_payment_hash")
-
-    def __init__(
-        self,
-        account_id: Optional[str],
-        method: str,
-        l402_amount_sats: int = 0,
-        l402_payment_hash: str = "",
-    ) -> None:
-        self.account_id = account_id
-        self.method = method
-        self.l402_amount_sats = l402_amount_sats
-        self.l402_payment_hash = l402_payment_hash
-
-
-async def _hire_resolve_auth(request: Request) -> "_HireAuth | Response":
+    """Result of hire auth resolution. Immutable, so instances (notably the
+    shared no-auth sentinel) can be reused freely across requests."""
+
+    account_id: Optional[str]
+    method: str
+    token: Optional[str] = None
+    l402_amount_sats: int = 0
+    l402_payment_hash: str = ""
+
+
+# Shared result for unauthenticated callers; nothing mutates _HireAuth after
+# construction, so the common no-header case skips the allocation.
+_HIRE_NO_AUTH = _HireAuth(account_id=None, method="none")
+
+
+async def _hire_resolve_auth(request: Request) -> _HireAuth:
     """
     Resolve hire caller identity.
 
     Checks X-Token header for account identity. Checks Authorization: L402 for
     payment proof. Both can be present simultaneously (no header collision).
     L402 payment is verified but NOT consumed — caller must call
-    _hire_consume_l402() after any amount checks.
+    _hire_consume_l402() after any amount checks. Raises ApiError on invalid
+    credentials.
     """
     token = _resolve_token(request)
-    auth_header = request.headers.get("authorization", "").strip()
-    has_l402 = auth_header.startswith("L402 ")
+    auth_header = request.headers.get("authorization")
+    if token is None and not auth_header:
+        return _HIRE_NO_AUTH
+
+    # Non-L402 Authorization schemes are ignored; only headers carrying the
+    # L402 prefix (possibly with stray outer whitespace) are parsed, and
+    # malformed ones keep their exact error messages.
+    l402_fields: Optional[Tuple[str, str]] = None
+    if auth_header:
+        stripped = (
+            auth_header if auth_header.startswith("L402 ") else auth_header.strip()
+        )
+        if stripped.startswith("L402 "):
+            try:
+                l402_fields = _parse_l402_authorization(stripped)
+            except ValueError as exc:
+                raise ApiError(401, "invalid_l402", str(exc))
 
     account_id: Optional[str] = None
     if token:
         try:
             account_id = await topup_store.get_account_id_by_token(token)
         except TopupInvalidToken:
-            return _build_error(401, "invalid_token", "Unknown X-Token")
+            raise ApiError(401, "invalid_token", "Unknown X-Token")
 
-    if has_l402:
+    if l402_fields is not None:
+        macaroon_b64, preimage = l402_fields
         try:
-            macaroon_b64, preimage = _parse_l402_authorization(auth_header)
             payment_hash, paid_amount, l402_account_id = _verify_l402_macaroon(macaroon_b64)
         except ValueError as exc:
-            return _build_error(401, "invalid_l402", str(exc))
+            raise ApiError(401, "invalid_l402", str(exc))
 
         try:
-            derived = _canonical_hash(_hash_from_preimage(preimage))
+            derived = _hash_from_preimage(preimage)
         except ValueError as exc:
-            return _build_error(400, "invalid_payment", str(exc))
+            raise ApiError(400, "invalid_payment", str(exc))
 
-        if derived != payment_hash:
-            return _build_error(401, "invalid_l402", "Preimage does not match payment_hash")
+        if not _payment_hashes_match(derived, payment_hash):
+            raise ApiError(401, "invalid_l402", "Preimage does not match payment_hash")
 
-        if used_hashes.is_used(payment_hash):
-            return _build_error(400, "payment_already_used", "Payment hash already redeemed")
+        # Replay protection lives in _hire_consume_l402: mark_used is an
+        # atomic check-and-set, so a second lookup here would only reopen
+        # the window between check and consume.
 
         # If L402 macaroon has account_id caveat, use it (unless X-Token overrides)
         resolved_account_id = account_id or l402_account_id
         return _HireAuth(
             account_id=resolved_account_id,
             method="l402",
+            token=token,
             l402_amount_sats=paid_amount,
             l402_payment_hash=payment_hash,
         )
 
     if account_id:
-        return _HireAuth(account_id=account_id, method="token")
+        return _HireAuth(account_id=account_id, method="token", token=token)
 
     # No auth at all
-    return _HireAuth(account_id=None, method="none")
+    return _HIRE_NO_AUTH
 
 
-def _hire_consume_l402(
-    auth: _HireAuth, min_sats: int = 0,
-) -> Optional[Response]:
+def _hire_consume_l402(auth: _HireAuth, min_sats: int = 0) -> None:
     """
     Consume an L402 payment (mark hash used). No-op for token auth.
 
-    Returns an error Response if the L402 amount is insufficient or was already
-    used; returns None on success.
+    Raises ApiError if the L402 amount is insufficient or was already used.
     """
     if auth.method != "l402":
-        return None
+        return
     if min_sats > 0 and auth.l402_amount_sats < min_sats:
-        return _build_error(
+        raise ApiError(
             402,
             "insufficient_payment",
             f"Need {min_sats} sats, L402 authorizes {auth.l402_amount_sats}",
         )
     if not used_hashes.mark_used(auth.l402_payment_hash):
-        return _build_error(400, "payment_already_used", "Payment hash already redeemed")
-    return None
+        raise ApiError(400, "payment_already_used", "Payment hash already redeemed")
 
 
 async def _hire_402_challenge(
@@ -1241,13 +1889,18 @@ async def _hire_402_challenge(
     save it for future requests (auto-account-creation flow).
     """
     invoice_amount = max(price_sats, 1)
-    try:
-        created_invoice = await phoenix_client.create_invoice(
-            amount_sats=invoice_amount,
-            description=f"hire:{description}",
-        )
-    except PhoenixError as exc:
-        return _build_error(503, "phoenix_unavailable", str(exc))
+    pooled = invoice_pool.take(invoice_amount)
+    if pooled is not None:
+        created_invoice, expires_in = pooled
+    else:
+        expires_in = _INVOICE_EXPIRY
+        try:
+            created_invoice = await phoenix_client.create_invoice(
+                amount_sats=invoice_amount,
+                description=f"hire:{description}",
+            )
+        except PhoenixError as exc:
+            return _build_error(503, "phoenix_unavailable", str(exc))
 
     payment_hash = _canonical_hash(created_invoice.get("paymentHash", ""))
     invoice = created_invoice.get("serialized", "")
@@ -1255,7 +1908,6 @@ async def _hire_402_challenge(
         return _build_error(503, "phoenix_unavailable", "Invalid invoice from phoenixd")
 
     macaroon_b64 = _create_l402_macaroon(payment_hash, invoice_amount, account_id=account_id)
-    expires_in = int(CONFIG.get("invoice_expiry", 600))
     body: Dict[str, Any] = {
         "status": "payment_required",
         "invoice": invoice,
@@ -1265,27 +1917,31 @@ async def _hire_402_challenge(
     }
     if new_token:
         body["token"] = new_token
-    response = JSONResponse(status_code=402, content=body)
-    response.headers["WWW-Authenticate"] = (
-        f'L402 macaroon="{macaroon_b64}", invoice="{invoice}"'
-    )
-    response.headers["X-Lightning-Invoice"] = invoice
-    response.headers["X-Payment-Hash"] = payment_hash
-    response.headers["X-Price-Sats"] = str(invoice_amount)
+    response = ORJSONResponse(status_code=402, content=body)
+    invoice_b = invoice.encode("ascii")
+    response.raw_headers.extend([
+        (b"www-authenticate", _WWW_AUTH_TPL % (macaroon_b64.encode("ascii"), invoice_b)),
+        (b"x-lightning-invoice", invoice_b),
+        (b"x-payment-hash", payment_hash.encode("ascii")),
+        (b"x-price-sats", _SATS_BYTES.get(invoice_amount) or str(invoice_amount).encode("ascii")),
+    ])
     if topup_store.ready:
-        response.headers["X-Topup-URL"] = "/api/v1/topup"
+        response.raw_headers.append((b"x-topup-url", b"/api/v1/topup"))
     return response
 
 
 async def _hire_require_paid(
-    request: Request,
+    auth: _HireAuth,
     price_sats: int,
     description: str,
-) -> "tuple[_HireAuth, Optional[Response]]":
+) -> Optional[Response]:
     """
     Require payment for a hire endpoint (POST task = 50 sats, POST quote = 10 sats).
 
-    Returns (auth, None) on success, or (auth, error_response) on failure.
+    Takes the already-resolved auth, so callers never trigger a second header
+    parse or token lookup. Returns a 402 challenge Response when payment is
+    still needed, None once payment is settled; raises ApiError on invalid
+    payment.
 
     Flow:
     - X-Token present + sufficient balance → debit and proceed
@@ -1293,463 +1949,357 @@ async def _hire_require_paid(
     - L402 present (with or without X-Token) → verify amount ≥ price_sats
     - No auth → auto-create account with 0 balance, return 402 + new token
     """
-    auth = await _hire_resolve_auth(request)
-    if isinstance(auth, Response):
-        return _HireAuth(account_id=None, method="none"), auth
-
     # L402 payment — verify amount covers price
     if auth.method == "l402":
-        err = _hire_consume_l402(auth, min_sats=price_sats)
-        if err:
-            return auth, err
-        return auth, None
+        _hire_consume_l402(auth, min_sats=price_sats)
+        return None
 
     # X-Token auth — debit balance
     if auth.method == "token" and auth.account_id:
         try:
             await topup_store.debit_token_balance(
-                token=_resolve_token(request),
+                token=auth.token,
                 amount_sats=price_sats,
                 endpoint=f"hire:{description}",
             )
         except TopupInsufficientBalance:
-            challenge = await _hire_402_challenge(
+            return await _hire_402_challenge(
                 price_sats=price_sats,
                 description=description,
                 account_id=auth.account_id,
             )
-            return auth, challenge
-        return auth, None
+        return None
 
     # No auth — auto-create account, return 402 with new token
     try:
         new_account_id, new_token = await topup_store.create_account()
     except Exception:
-        return auth, _build_error(503, "topup_unavailable", "Cannot create account")
-    challenge = await _hire_402_challenge(
+        raise ApiError(503, "topup_unavailable", "Cannot create account")
+    return await _hire_402_challenge(
         price_sats=price_sats,
         description=description,
         account_id=new_account_id,
         new_token=new_token,
     )
-    return auth, challenge
 
 
-def _hire_require_identity(
-    auth: "_HireAuth | Response",
-) -> Optional[Response]:
-    """Return an error Response if the auth has no account identity, else None."""
-    if isinstance(auth, Response):
-        return auth
+def _hire_require_identity(auth: _HireAuth) -> None:
+    """Raise ApiError if the auth has no account identity."""
     if not auth.account_id:
-        return _build_error(
+        raise ApiError(
             401, "account_required",
             "This endpoint requires X-Token header for account identity.",
         )
-    return None
+
+
+@dataclass(slots=True)
+class HireCtx:
+    """Per-request hire context: the store plus the resolved caller auth."""
+
+    store: HireStore
+    auth: _HireAuth
+
+
+async def _hire_store_dep() -> HireStore:
+    if hire_store is None:
+        raise ApiError(503, "hire_unavailable", "AI for Hire is not available")
+    return hire_store
+
+
+async def _hire_ctx(request: Request) -> HireCtx:
+    return HireCtx(
+        store=await _hire_store_dep(),
+        auth=await _hire_resolve_auth(request),
+    )
+
+
+class CreateTaskBody(_BodyModel):
+    title: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+    description: str = ""
+    budget_sats: PositiveInt
+
+    _FIELD_ERRORS = {
+        "title": ("missing_field", "title is required"),
+        "budget_sats": ("invalid_field", "budget_sats must be a positive integer"),
+    }
+
+
+class CreateQuoteBody(_BodyModel):
+    price_sats: PositiveInt
+    description: str = ""
+
+    _FIELD_ERRORS = {
+        "price_sats": ("invalid_field", "price_sats must be a positive integer"),
+    }
+
+
+class UpdateQuoteBody(_BodyModel):
+    price_sats: Optional[PositiveInt] = None
+    description: Optional[str] = None
+
+    _FIELD_ERRORS = {
+        "price_sats": ("invalid_field", "price_sats must be a positive integer"),
+    }
+
+
+class QuoteMessageBody(_BodyModel):
+    body: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+
+    _FIELD_ERRORS = {
+        "body": ("missing_field", "body is required"),
+    }
+
+
+class DeliverBody(_BodyModel):
+    filename: str = ""
+    content_base64: str = ""
+    notes: str = ""
+
+
+class CollectBody(_BodyModel):
+    invoice: Annotated[str, StringConstraints(strip_whitespace=True, min_length=1)]
+    amount_sats: PositiveInt
+
+    _FIELD_ERRORS = {
+        "invoice": ("missing_field", "invoice (bolt11) is required"),
+        "amount_sats": ("invalid_field", "amount_sats must be a positive integer"),
+    }
 
 
 # ── AI for Hire endpoints ─────────────────────────────────────────
 
 
 @app.get("/api/v1/ai-for-hire/me")
-async def hire_me(request: Request) -> Response:
+async def hire_me(ctx: HireCtx = Depends(_hire_ctx)) -> Response:
     """Account info. Requires X-Token (free, no sats cost)."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth = await _hire_resolve_auth(request)
-    err = _hire_require_identity(auth)
-    if err:
-        return err
+    _hire_require_identity(ctx.auth)
 
     try:
-        info = await store.get_account_info(auth.account_id)
+        info = await ctx.store.get_account_info(ctx.auth.account_id)
     except HireNotFound:
         return _build_error(404, "not_found", "Account not found")
-    return JSONResponse(info)
+    return ORJSONResponse(info)
 
 
 @app.post("/api/v1/ai-for-hire/tasks")
-async def hire_create_task(request: Request) -> Response:
+async def hire_create_task(
+    ctx: HireCtx = Depends(_hire_ctx),
+    body: CreateTaskBody = Depends(_body(CreateTaskBody)),
+) -> Response:
     """Post a new task. Costs 50 sats (X-Token balance or L402)."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth, err = await _hire_require_paid(request, price_sats=50, description="post_task")
-    if err:
-        return err
-    if not auth.account_id:
-        return _build_error(401, "account_required",
-                            "This endpoint requires account identity.")
-
-    try:
-        body = await request.json()
-    except Exception:
-        return _build_error(400, "invalid_request", "Request body must be JSON")
-    if not isinstance(body, dict):
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
-
-    title = body.get("title", "").strip()
-    if not title:
-        return _build_error(400, "missing_field", "title is required")
-    description = body.get("description", "")
-    try:
-        budget_sats = int(body.get("budget_sats", 0))
-    except (TypeError, ValueError):
-        return _build_error(400, "invalid_field", "budget_sats must be a positive integer")
-    if budget_sats <= 0:
-        return _build_error(400, "invalid_field", "budget_sats must be a positive integer")
+    challenge = await _hire_require_paid(ctx.auth, price_sats=50, description="post_task")
+    if challenge is not None:
+        return challenge
+    if not ctx.auth.account_id:
+        raise ApiError(401, "account_required",
+                       "This endpoint requires account identity.")
 
     try:
-        task = await store.create_task(auth.account_id, title, description, budget_sats)
+        task = await ctx.store.create_task(
+            ctx.auth.account_id, body.title, body.description, body.budget_sats
+        )
     except HireError as exc:
         return _build_error(400, "hire_error", str(exc))
-    return JSONResponse(task, status_code=201)
+    return ORJSONResponse(task, status_code=201)
 
 
 @app.get("/api/v1/ai-for-hire/tasks")
-async def hire_list_tasks(request: Request) -> Response:
+async def hire_list_tasks(
+    status: Optional[str] = None, store: HireStore = Depends(_hire_store_dep)
+) -> Response:
     """List tasks. Free, no auth required."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    status_filter = request.query_params.get("status")
-    tasks = await store.list_tasks(status=status_filter)
-    return JSONResponse({"tasks": tasks})
+    tasks = await store.list_tasks(status=status)
+    return ORJSONResponse({"tasks": tasks})
 
 
 @app.get("/api/v1/ai-for-hire/tasks/{task_id}")
-async def hire_get_task(task_id: str, request: Request) -> Response:
+async def hire_get_task(
+    task_id: str, store: HireStore = Depends(_hire_store_dep)
+) -> Response:
     """Get task detail. Free, no auth required."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
     try:
         detail = await store.get_task_detail(task_id)
     except HireNotFound:
         return _build_error(404, "not_found", "Task not found")
-    except Exception:
+    except ValueError:
         return _build_error(400, "invalid_request", "Invalid task ID")
-    return JSONResponse(detail)
+    return ORJSONResponse(detail)
 
 
 @app.post("/api/v1/ai-for-hire/tasks/{task_id}/quotes")
-async def hire_create_quote(task_id: str, request: Request) -> Response:
+async def hire_create_quote(
+    task_id: str,
+    ctx: HireCtx = Depends(_hire_ctx),
+    body: CreateQuoteBody = Depends(_body(CreateQuoteBody)),
+) -> Response:
     """Submit a quote. Costs 10 sats (X-Token balance or L402)."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth, err = await _hire_require_paid(request, price_sats=10, description="post_quote")
-    if err:
-        return err
-    if not auth.account_id:
-        return _build_error(401, "account_required",
-                            "This endpoint requires account identity.")
+    challenge = await _hire_require_paid(ctx.auth, price_sats=10, description="post_quote")
+    if challenge is not None:
+        return challenge
+    if not ctx.auth.account_id:
+        raise ApiError(401, "account_required",
+                       "This endpoint requires account identity.")
 
     try:
-        body = await request.json()
-    except Exception:
-        return _build_error(400, "invalid_request", "Request body must be JSON")
-    if not isinstance(body, dict):
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
-
-    try:
-        price_sats = int(body.get("price_sats", 0))
-    except (TypeError, ValueError):
-        return _build_error(400, "invalid_field", "price_sats must be a positive integer")
-    if price_sats <= 0:
-        return _build_error(400, "invalid_field", "price_sats must be a positive integer")
-    description = body.get("description", "")
-
-    try:
-        quote = await store.create_quote(task_id, auth.account_id, price_sats, description)
-    except HireNotFound as exc:
-        return _build_error(404, "not_found", str(exc))
-    except HireInvalidState as exc:
-        return _build_error(409, "invalid_state", str(exc))
-    except HireForbidden as exc:
-        return _build_error(403, "forbidden", str(exc))
-    except Exception:
+        quote = await ctx.store.create_quote(
+            task_id, ctx.auth.account_id, body.price_sats, body.description
+        )
+    except HireError as exc:
+        return _build_error(exc.status_code, exc.code, str(exc))
+    except ValueError:
         return _build_error(400, "invalid_request", "Invalid task ID")
-    return JSONResponse(quote, status_code=201)
+    return ORJSONResponse(quote, status_code=201)
 
 
 @app.post("/api/v1/ai-for-hire/tasks/{task_id}/quotes/{quote_id}/accept")
-async def hire_accept_quote(task_id: str, quote_id: str, request: Request) -> Response:
+async def hire_accept_quote(
+    task_id: str, quote_id: str, ctx: HireCtx = Depends(_hire_ctx)
+) -> Response:
     """Accept a quote and lock escrow. Free, X-Token required. Buyer needs sufficient balance."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth = await _hire_resolve_auth(request)
-    err = _hire_require_identity(auth)
-    if err:
-        return err
+    _hire_require_identity(ctx.auth)
 
     # Consume L402 if present (no-op for token auth)
-    err = _hire_consume_l402(auth)
-    if err:
-        return err
+    _hire_consume_l402(ctx.auth)
 
     # Debit buyer balance for escrow; on insufficient balance issue 402
     try:
-        result = await store.accept_quote(task_id, quote_id, auth.account_id)
-    except HireNotFound as exc:
-        return _build_error(404, "not_found", str(exc))
-    except HireInvalidState as exc:
-        return _build_error(409, "invalid_state", str(exc))
-    except HireForbidden as exc:
-        return _build_error(403, "forbidden", str(exc))
+        result = await ctx.store.accept_quote(task_id, quote_id, ctx.auth.account_id)
     except HireInsufficientBalance as exc:
         return await _hire_402_challenge(
             price_sats=exc.required_sats,
             description=f"escrow:{task_id}",
-            account_id=auth.account_id,
+            account_id=ctx.auth.account_id,
         )
-    except Exception:
+    except HireError as exc:
+        return _build_error(exc.status_code, exc.code, str(exc))
+    except ValueError:
         return _build_error(400, "invalid_request", "Invalid task or quote ID")
-    return JSONResponse(result)
+    return ORJSONResponse(result)
 
 
 @app.patch("/api/v1/ai-for-hire/tasks/{task_id}/quotes/{quote_id}")
-async def hire_update_quote(task_id: str, quote_id: str, request: Request) -> Response:
+async def hire_update_quote(
+    task_id: str,
+    quote_id: str,
+    ctx: HireCtx = Depends(_hire_ctx),
+    body: UpdateQuoteBody = Depends(_body(UpdateQuoteBody)),
+) -> Response:
     """Update a pending quote (contractor only). Free, X-Token required."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth = await _hire_resolve_auth(request)
-    err = _hire_require_identity(auth)
-    if err:
-        return err
-
-    try:
-        body = await request.json()
-    except Exception:
-        return _build_error(400, "invalid_request", "Request body must be JSON")
-    if not isinstance(body, dict):
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
-
-    price_sats = None
-    if "price_sats" in body:
-        try:
-            price_sats = int(body["price_sats"])
-        except (TypeError, ValueError):
-            return _build_error(400, "invalid_field", "price_sats must be a positive integer")
-        if price_sats <= 0:
-            return _build_error(400, "invalid_field", "price_sats must be a positive integer")
-    description = body.get("description")
+    _hire_require_identity(ctx.auth)
 
     try:
-        result = await store.update_quote(task_id, quote_id, auth.account_id,
-                                          price_sats=price_sats, description=description)
-    except HireNotFound as exc:
-        return _build_error(404, "not_found", str(exc))
-    except HireInvalidState as exc:
-        return _build_error(409, "invalid_state", str(exc))
-    except HireForbidden as exc:
-        return _build_error(403, "forbidden", str(exc))
+        result = await ctx.store.update_quote(task_id, quote_id, ctx.auth.account_id,
+                                              price_sats=body.price_sats,
+                                              description=body.description)
     except HireError as exc:
-        return _build_error(400, "hire_error", str(exc))
-    except Exception:
+        return _build_error(exc.status_code, exc.code, str(exc))
+    except ValueError:
         return _build_error(400, "invalid_request", "Invalid task or quote ID")
-    return JSONResponse(result)
+    return ORJSONResponse(result)
 
 
 @app.post("/api/v1/ai-for-hire/tasks/{task_id}/quotes/{quote_id}/messages")
-async def hire_send_quote_message(task_id: str, quote_id: str, request: Request) -> Response:
+async def hire_send_quote_message(
+    task_id: str,
+    quote_id: str,
+    ctx: HireCtx = Depends(_hire_ctx),
+    body: QuoteMessageBody = Depends(_body(QuoteMessageBody)),
+) -> Response:
     """Send a message on a quote thread. Free, X-Token required. Buyer or contractor only."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth = await _hire_resolve_auth(request)
-    err = _hire_require_identity(auth)
-    if err:
-        return err
+    _hire_require_identity(ctx.auth)
 
     try:
-        body = await request.json()
-    except Exception:
-        return _build_error(400, "invalid_request", "Request body must be JSON")
-    if not isinstance(body, dict):
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
-
-    text = body.get("body", "").strip()
-    if not text:
-        return _build_error(400, "missing_field", "body is required")
-
-    try:
-        msg = await store.send_quote_message(task_id, quote_id, auth.account_id, text)
-    except HireNotFound as exc:
-        return _build_error(404, "not_found", str(exc))
-    except HireInvalidState as exc:
-        return _build_error(409, "invalid_state", str(exc))
-    except HireForbidden as exc:
-        return _build_error(403, "forbidden", str(exc))
-    except Exception:
+        msg = await ctx.store.send_quote_message(
+            task_id, quote_id, ctx.auth.account_id, body.body
+        )
+    except HireError as exc:
+        return _build_error(exc.status_code, exc.code, str(exc))
+    except ValueError:
         return _build_error(400, "invalid_request", "Invalid task or quote ID")
-    return JSONResponse(msg, status_code=201)
+    return ORJSONResponse(msg, status_code=201)
 
 
 @app.get("/api/v1/ai-for-hire/tasks/{task_id}/quotes/{quote_id}/messages")
-async def hire_get_quote_messages(task_id: str, quote_id: str, request: Request) -> Response:
+async def hire_get_quote_messages(
+    task_id: str, quote_id: str, since_id: int = 0, ctx: HireCtx = Depends(_hire_ctx)
+) -> Response:
     """Get messages on a quote thread. Free, X-Token required. Buyer or contractor only."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth = await _hire_resolve_auth(request)
-    err = _hire_require_identity(auth)
-    if err:
-        return err
+    _hire_require_identity(ctx.auth)
 
     try:
-        since_id = int(request.query_params.get("since_id", "0"))
-    except (TypeError, ValueError):
-        since_id = 0
-
-    try:
-        messages = await store.get_quote_messages(task_id, quote_id, auth.account_id, since_id=since_id)
-    except HireNotFound as exc:
-        return _build_error(404, "not_found", str(exc))
-    except HireForbidden as exc:
-        return _build_error(403, "forbidden", str(exc))
-    except Exception:
+        messages = await ctx.store.get_quote_messages(task_id, quote_id, ctx.auth.account_id, since_id=since_id)
+    except HireError as exc:
+        return _build_error(exc.status_code, exc.code, str(exc))
+    except ValueError:
         return _build_error(400, "invalid_request", "Invalid task or quote ID")
-    return JSONResponse({"messages": messages})
+    return ORJSONResponse({"messages": messages})
 
 
 @app.post("/api/v1/ai-for-hire/tasks/{task_id}/deliver")
-async def hire_deliver(task_id: str, request: Request) -> Response:
+async def hire_deliver(
+    task_id: str,
+    ctx: HireCtx = Depends(_hire_ctx),
+    body: DeliverBody = Depends(_body(DeliverBody)),
+) -> Response:
     """Upload delivery. Free, X-Token required."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth = await _hire_resolve_auth(request)
-    err = _hire_require_identity(auth)
-    if err:
-        return err
-
-    try:
-        body = await request.json()
-    except Exception:
-        return _build_error(400, "invalid_request", "Request body must be JSON")
-    if not isinstance(body, dict):
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
-
-    filename = body.get("filename", "")
-    content_base64 = body.get("content_base64", "")
-    notes = body.get("notes", "")
+    _hire_require_identity(ctx.auth)
 
     try:
-        delivery = await store.create_delivery(task_id, auth.account_id, filename, content_base64, notes)
-    except HireNotFound as exc:
-        return _build_error(404, "not_found", str(exc))
-    except HireInvalidState as exc:
-        return _build_error(409, "invalid_state", str(exc))
-    except HireForbidden as exc:
-        return _build_error(403, "forbidden", str(exc))
-    except Exception:
+        delivery = await ctx.store.create_delivery(
+            task_id, ctx.auth.account_id, body.filename, body.content_base64, body.notes
+        )
+    except HireError as exc:
+        return _build_error(exc.status_code, exc.code, str(exc))
+    except ValueError:
         return _build_error(400, "invalid_request", "Invalid task ID")
-    return JSONResponse(delivery, status_code=201)
+    return ORJSONResponse(delivery, status_code=201)
 
 
 @app.post("/api/v1/ai-for-hire/tasks/{task_id}/confirm")
-async def hire_confirm(task_id: str, request: Request) -> Response:
+async def hire_confirm(
+    task_id: str, ctx: HireCtx = Depends(_hire_ctx)
+) -> Response:
     """Confirm delivery and release escrow. Free, X-Token required."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth = await _hire_resolve_auth(request)
-    err = _hire_require_identity(auth)
-    if err:
-        return err
+    _hire_require_identity(ctx.auth)
 
     try:
-        result = await store.confirm_delivery(task_id, auth.account_id)
-    except HireNotFound as exc:
-        return _build_error(404, "not_found", str(exc))
-    except HireInvalidState as exc:
-        return _build_error(409, "invalid_state", str(exc))
-    except HireForbidden as exc:
-        return _build_error(403, "forbidden", str(exc))
-    except Exception:
+        result = await ctx.store.confirm_delivery(task_id, ctx.auth.account_id)
+    except HireError as exc:
+        return _build_error(exc.status_code, exc.code, str(exc))
+    except ValueError:
         return _build_error(400, "invalid_request", "Invalid task ID")
-    return JSONResponse(result)
+    return ORJSONResponse(result)
 
 
 @app.post("/api/v1/ai-for-hire/collect")
-async def hire_collect(request: Request) -> Response:
+async def hire_collect(
+    ctx: HireCtx = Depends(_hire_ctx),
+    body: CollectBody = Depends(_body(CollectBody)),
+) -> Response:
     """Withdraw balance via Lightning invoice. Free, X-Token required."""
-    try:
-        store = _require_hire()
-    except RuntimeError:
-        return _build_error(503, "hire_unavailable", "AI for Hire is not available")
-
-    auth = await _hire_resolve_auth(request)
-    err = _hire_require_identity(auth)
-    if err:
-        return err
-
-    try:
-        body = await request.json()
-    except Exception:
-        return _build_error(400, "invalid_request", "Request body must be JSON")
-    if not isinstance(body, dict):
-        return _build_error(400, "invalid_request", "Request body must be a JSON object")
+    _hire_require_identity(ctx.auth)
 
-    bolt11 = body.get("invoice", "").strip()
-    if not bolt11:
-        return _build_error(400, "missing_field", "invoice (bolt11) is required")
-
-    try:
-        amount_sats = int(body.get("amount_sats", 0))
-    except (TypeError, ValueError):
-        return _build_error(400, "invalid_field", "amount_sats must be a positive integer")
-    if amount_sats <= 0:
-        return _build_error(400, "invalid_field", "amount_sats must be a positive integer")
+    bolt11 = body.invoice
+    amount_sats = body.amount_sats
 
-    # Debit account balance
+    # Debit and pay inside one transaction: a failed Lightning payment
+    # rolls the debit back instead of relying on a best-effort refund.
     try:
-        await store.debit_account(auth.account_id, amount_sats, "hire:collect")
+        pay_result = await ctx.store.collect(
+            ctx.auth.account_id,
+            amount_sats,
+            "hire:collect",
+            lambda: phoenix_client.pay_invoice(bolt11),
+        )
     except HireInsufficientBalance as exc:
         return _build_error(
             402, "insufficient_balance",
             f"Need {exc.required_sats} sats but account balance is insufficient.",
         )
-
-    # Pay the LN invoice
-    try:
-        pay_result = await phoenix_client.pay_invoice(bolt11)
     except PhoenixError as exc:
-        # Refund on failure
-        try:
-            await store.credit_account(auth.account_id, amount_sats)
-        except Exception:
-            pass
         return _build_error(502, "payment_failed", f"Lightning payment failed: {exc}")
 
-    return JSONResponse({
+    return ORJSONResponse({
         "status": "paid",
         "amount_sats": amount_sats,
         "payment": pay_result,
@@ -1768,51 +2318,60 @@ async def create_payment_required(
     if api_config is None or endpoint_config is None:
         return _build_error(404, "api_not_found", "Requested endpoint is not configured")
 
-    body_bytes = await request.body()
     max_bytes = _max_request_bytes(endpoint_config)
+
+    # Reject oversized uploads before buffering them: Content-Length first,
+    # and for chunked bodies stop reading the moment the cap is crossed, so
+    # worst-case memory is max_bytes rather than whatever the client sends.
+    content_length = request.headers.get("content-length")
+    if content_length is not None:
+        try:
+            declared = int(content_length)
+        except ValueError:
+            return _build_error(400, "invalid_request", "Invalid Content-Length header")
+        if declared > max_bytes:
+            return _request_too_large(max_bytes)
+        body_bytes = await request.body()
+    else:
+        buf = bytearray()
+        async for chunk in request.stream():
+            buf += chunk
+            if len(buf) > max_bytes:
+                return _request_too_large(max_bytes)
+        body_bytes = bytes(buf)
     if len(body_bytes) > max_bytes:
-        return JSONResponse(
-            status_code=413,
-            content={
-                "error": {
-                    "code": "request_too_large",
-                    "message": f"Max request size: {max_bytes} bytes",
-                    "max_bytes": max_bytes,
-                }
-            },
-        )
+        return _request_too_large(max_bytes)
 
     incoming_content_type = request.headers.get("content-type", "")
     content_type_lc = incoming_content_type.lower()
     is_json = "application/json" in content_type_lc
 
     request_body: Dict[str, Any] = {}
+    # Non-JSON bodies (multipart audio/image uploads) price at the endpoint's
+    # default model; JSON bodies re-resolve below once the body is parsed.
+    model_name, model_config = _resolve_request_model(endpoint_config, request_body)
+    # Read once from the parsed body while it is in hand, instead of
+    # re-scanning the stored bytes for the flag at proxy time.
+    wants_stream = False
     stored_body_bytes = body_bytes
     stored_content_type = incoming_content_type or "application/json"
 
-    requires_json = normalized_path in {
-        "/v1/chat/completions",
-        "/v1/responses",
-        "/v1/images/generations",
-        "/v1/audio/speech",
-        "/v1/embeddings",
-        "/v1/moderations",
-        "/v1/video/generations",
-    }
-
-    if requires_json and not is_json:
+    if normalized_path in _REQUIRES_JSON and not is_json:
         return _build_error(400, "invalid_request", "Request body must be a JSON object")
 
     if is_json:
         try:
-            parsed_body = json.loads(body_bytes.decode("utf-8")) if body_bytes else {}
+            parsed_body = orjson.loads(body_bytes) if body_bytes else {}
         except Exception:
             return _build_error(400, "invalid_request", "Request body must be a JSON object")
         if not isinstance(parsed_body, dict):
             return _build_error(400, "invalid_request", "Request body must be a JSON object")
         request_body = parsed_body
+        model_name, model_config = _resolve_request_model(endpoint_config, request_body)
         try:
-            request_body = _apply_request_rules(normalized_path, endpoint_config, request_body)
+            rewritten = _apply_request_rules(
+                normalized_path, request_body, model_name, model_config
+            )
         except LookupError as exc:
             model_name = str(exc).split(":", 1)[-1]
             return _build_error(
@@ -1820,18 +2379,24 @@ async def create_payment_required(
                 "model_not_supported",
                 f"Model '{model_name}' is not available",
             )
+        if rewritten is not None:
+            request_body = rewritten
 
         validation_error = _validate_required_fields(normalized_path, request_body)
         if validation_error is not None:
             return validation_error
 
-        stored_body_bytes = json.dumps(
-            request_body, separators=(",", ":"), ensure_ascii=False
-        ).encode("utf-8")
+        if rewritten is not None or not body_bytes:
+            # orjson emits compact UTF-8 bytes directly, no separators/encode
+            # step. When no rule rewrote the body the client's own bytes are
+            # forwarded as-is and the re-encode is skipped entirely.
+            stored_body_bytes = orjson.dumps(request_body)
         stored_content_type = "application/json"
+        if normalized_path in _STREAMABLE_PATHS:
+            wants_stream = request_body.get("stream") is True
 
     try:
-        amount_sats = _price_for_request(endpoint_config, request_body)
+        amount_sats = _price_for_request(endpoint_config, model_name, model_config)
     except LookupError as exc:
         model_name = str(exc).split(":", 1)[-1]
         return _build_error(
@@ -1847,12 +2412,9 @@ async def create_payment_required(
         return _build_error(429, "daily_limit_reached", rate_limit_msg)
 
     token = _resolve_token(request)
-    auth_header = request.headers.get("authorization", "").strip()
-    has_l402_auth = auth_header.startswith("L402 ")
-
     if token:
-        if not topup_store.ready:
-            return _build_error(503, "topup_unavailable", "Topup service is not configured")
+        if not _token_auth_enabled:
+            return _TOPUP_UNAVAILABLE
         try:
             await topup_store.debit_token_balance(
                 token=token,
@@ -1871,17 +2433,28 @@ async def create_payment_required(
                 ),
             )
         except RuntimeError:
-            return _build_error(503, "topup_unavailable", "Topup service is not configured")
+            return _TOPUP_UNAVAILABLE
 
         return await _proxy_upstream(
             api_name=api_name,
             normalized_path=normalized_path,
-            api_config=api_config,
             endpoint_config=endpoint_config,
             request_bytes=stored_body_bytes,
             request_content_type=stored_content_type,
+            accept_encoding=request.headers.get("accept-encoding"),
+            wants_stream=wants_stream,
         )
 
+    # The Authorization header only matters once token auth is ruled out, so
+    # the header lookup (and any strip for stray edge whitespace) is skipped
+    # entirely on the token path.
+    auth_header = request.headers.get("authorization")
+    has_l402_auth = False
+    if auth_header:
+        if auth_header[0] == " " or auth_header[-1] == " ":
+            auth_header = auth_header.strip()
+        has_l402_auth = auth_header.startswith("L402 ")
+
     if has_l402_auth:
         try:
             macaroon_b64, preimage = _parse_l402_authorization(auth_header)
@@ -1890,20 +2463,17 @@ async def create_payment_required(
             return _build_error(401, "invalid_l402", str(exc))
 
         try:
-            derived_payment_hash = _canonical_hash(_hash_from_preimage(preimage))
+            derived_payment_hash = _hash_from_preimage(preimage)
         except ValueError as exc:
             return _build_error(400, "invalid_payment", str(exc))
 
-        if derived_payment_hash != payment_hash:
+        if not _payment_hashes_match(derived_payment_hash, payment_hash):
             return _build_error(
                 401,
                 "invalid_l402",
                 "Preimage does not match macaroon payment_hash",
             )
 
-        if used_hashes.is_used(payment_hash):
-            return _build_error(400, "payment_already_used", "Payment hash already redeemed")
-
         if amount_sats > paid_amount_sats:
             return _build_error(
                 402,
@@ -1914,25 +2484,34 @@ async def create_payment_required(
                 ),
             )
 
+        # mark_used is an atomic check-and-set, so one call both detects
+        # replays and consumes the hash; it runs after the amount check so
+        # an underpaying request never burns its payment.
         if not used_hashes.mark_used(payment_hash):
             return _build_error(400, "payment_already_used", "Payment hash already redeemed")
 
         return await _proxy_upstream(
             api_name=api_name,
             normalized_path=normalized_path,
-            api_config=api_config,
             endpoint_config=endpoint_config,
             request_bytes=stored_body_bytes,
             request_content_type=stored_content_type,
+            accept_encoding=request.headers.get("accept-encoding"),
+            wants_stream=wants_stream,
         )
 
-    try:
-        created_invoice = await phoenix_client.create_invoice(
-            amount_sats=amount_sats,
-            description=f"{api_name}:{normalized_path}",
-        )
-    except PhoenixError as exc:
-        return _build_error(503, "phoenix_unavailable", str(exc))
+    pooled = invoice_pool.take(amount_sats)
+    if pooled is not None:
+        created_invoice, expires_in = pooled
+    else:
+        expires_in = _INVOICE_EXPIRY
+        try:
+            created_invoice = await phoenix_client.create_invoice(
+                amount_sats=amount_sats,
+                description=f"{api_name}:{normalized_path}",
+            )
+        except PhoenixError as exc:
+            return _build_error(503, "phoenix_unavailable", str(exc))
 
     payment_hash = _canonical_hash(created_invoice.get("paymentHash", ""))
     invoice = created_invoice.get("serialized", "")
@@ -1940,36 +2519,35 @@ async def create_payment_required(
         return _build_error(503, "phoenix_unavailable", "Invalid invoice payload from phoenixd")
 
     macaroon_b64 = _create_l402_macaroon(payment_hash, amount_sats)
-    expires_in = int(CONFIG.get("invoice_expiry", 600))
-    response = JSONResponse(
+    invoice_b = invoice.encode("ascii")
+    payment_hash_b = payment_hash.encode("ascii")
+    response = Response(
+        content=_402_BODY_TPL
+        % (invoice_b, payment_hash_b, amount_sats, expires_in),
         status_code=402,
-        content={
-            "status": "payment_required",
-            "invoice": invoice,
-            "payment_hash": payment_hash,
-            "amount_sats": amount_sats,
-            "expires_in": expires_in,
-        },
+        media_type="application/json",
     )
-    response.headers["WWW-Authenticate"] = (
-        f'L402 macaroon="{macaroon_b64}", invoice="{invoice}"'
-    )
-    response.headers["X-Lightning-Invoice"] = invoice
-    response.headers["X-Payment-Hash"] = payment_hash
-    response.headers["X-Price-Sats"] = str(amount_sats)
+    extra_headers = [
+        (b"www-authenticate", _WWW_AUTH_TPL % (macaroon_b64.encode("ascii"), invoice_b)),
+        (b"x-lightning-invoice", invoice_b),
+        (b"x-payment-hash", payment_hash_b),
+        (b"x-price-sats", _SATS_BYTES.get(amount_sats) or str(amount_sats).encode("ascii")),
+    ]
     if topup_store.ready:
-        response.headers["X-Topup-URL"] = "/api/v1/topup"
+        extra_headers.append((b"x-topup-url", b"/api/v1/topup"))
+    response.raw_headers.extend(extra_headers)
     return response
 
 
 @app.get("/{full_path:path}", include_in_schema=False)
 async def frontend_catchall(full_path: str) -> Response:
-    static_file = _resolve_frontend_file(full_path)
-    if static_file is not None:
-        return FileResponse(static_file)
+    resolved = _resolve_frontend_file(full_path)
+    if resolved is not None:
+        static_file, stat_result = resolved
+        return FileResponse(static_file, stat_result=stat_result)
 
     reserved_root = full_path.split("/", 1)[0]
-    if reserved_root in {"api"}:
+    if reserved_root in _RESERVED_ROOTS:
         return _build_error(404, "not_found", "Route not found")
 
     return _frontend_index_response()